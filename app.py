@@ -1,48 +1,130 @@
 import dash
-import json
+from pathlib import Path
 import pandas as pd
 from visualisations import Visualise
+from result_cache import ResultCache
+from jobs import JobQueue
+from progress import ProgressRegistry
 from app_components.layout import layout
 from app_components.chart_components import ChartComponents
 from app_components.control_components import ControlComponents
 from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
 
 
-vis = Visualise()
 chart_components = ChartComponents()
 control_components = ControlComponents()
+# results are kept on the server, callbacks pass their key through the layout. every result is written to
+# disk so app processes sharing saved_transactions/results can read each other's results
+results = ResultCache(max_items=32, spill_path=Path('saved_transactions/results'), write_through=True)
+result_names = ['transactions', 'insider_stats', 'volatility_stats', 'performance_stats', 'price_data']
+
+
+def save_status(job):
+    '''save the status of a finished job, app processes other than the one running it read it from results'''
+    results.put({'status': job.status, 'error': job.error}, key=f'{job.id}.status')
+
+
+# scrapes run in the background of the process they were submitted to
+jobs = JobQueue(workers=4, on_finish=save_status)
+# progress messages of each job, shown on the submit button
+progress = ProgressRegistry()
 
 app = dash.Dash(__name__)
 app.layout = layout
+# wsgi server for gunicorn, e.g. gunicorn app:server --workers 4, workers share the SEC rate limit
+server = app.server
+
+
+def job_state(job_id):
+    '''(status, error) of a job, jobs run by other app processes are only known once they have finished'''
+    job = jobs.get(job_id)
+    if job is not None:
+        return job.status, job.error
+    try:
+        state = results.get(f'{job_id}.status')
+    except KeyError:
+        return None
+    return state['status'], state['error']
+
+
+def load_stats(job, ticker, from_date, to_date):
+    '''background job getting data for ticker, the result is stored under the job's id'''
+    # log to progress, the scraper reports extraction progress under the job's id and stops at its next
+    # report once the job is cancelled
+    progress.update(job.id, 'retrieving data...', force=True)
+    vis = Visualise(progress=progress.reporter(job.id, check=job.check))
+    try:
+        # get data from Statistics.py
+        data = vis.get_stats(ticker, from_date, to_date)
+    finally:
+        progress.update(job.id, None, force=True)
+    job.check()
+
+    # features let later requests filter and draw the result without scraping again
+    return results.put(dict(zip(result_names, data), features=vis.features()), key=job.id)
 
 
 # Getting data if submit button clicked
 @app.callback(
-    [
-        Output('stored_transactions', 'children'),
-        Output('stored_insider_stats', 'children'),
-        Output('stored_volatility_stats', 'children'),
-        Output('stored_performence_stats', 'children'),
-        Output('stored_price_data', 'children'),
-    ],
+    [Output('job_id', 'children')],
     [
         Input('submit_button', 'n_clicks'),
         State('input_ticker', 'value'),
         State('date_from', 'date'),
         State('date_to', 'date'),
+        State('job_id', 'children'),
     ]
 )
-def get_data(submit, ticker, to_date, from_date):
-    '''get data'''
-    # log to progress
-    control_components.progress('retrieving data...')
-    out = []
+def get_data(submit, ticker, to_date, from_date, job_id):
+    '''queue a job getting data, equal requests share one job'''
     from_date, to_date = from_date[:10], to_date[:10]
-    # get data from Statistics.py
-    data = vis.get_stats(ticker, from_date, to_date)
-    [out.append(i) for i in data]
+    key = ('stats', ticker.upper(), from_date, to_date)
+
+    # clicking submit again while the job runs doesn't count this browser twice
+    return [jobs.submit(key, load_stats, ticker, from_date, to_date, previous=job_id)]
+
+
+# cancel the running job
+@app.callback(
+    [Output('cancel_button', 'children')],
+    [
+        Input('cancel_button', 'n_clicks'),
+        Input('job_id', 'children')
+    ]
+)
+def cancel_job(cancel, job_id):
+    '''cancel the job of the last submit, the button shows whether it was cancelled'''
+    # a new job resets the button
+    ctx = dash.callback_context.triggered[0]['prop_id']
+    if ctx != 'cancel_button.n_clicks' or not cancel:
+        return ['Cancel']
+    if jobs.cancel(job_id):
+        return ['Cancelled']
+    # other requests sharing the job still want the result, or it has finished or runs in another process
+    state = job_state(job_id)
+    return ['Still running for other requests'] if state and state[0] in ('queued', 'running') else ['Nothing to cancel']
 
-    return [i.to_json(date_format='iso', orient='split') for i in out]
+
+# poll for the result of the job
+@app.callback(
+    [Output('stored_result', 'children')],
+    [
+        Input('interval_componant', 'n_intervals'),
+        Input('job_id', 'children'),
+        State('stored_result', 'children')
+    ]
+)
+def job_result(n, job_id, stored_result):
+    '''store the result of the job once it is done, the job may have run in another process'''
+    if job_id is None or job_id == stored_result:
+        raise PreventUpdate
+    try:
+        results.get(job_id)
+    except KeyError:
+        raise PreventUpdate
+
+    return [job_id]
 
 
 # populate insiders selector
@@ -52,14 +134,14 @@ def get_data(submit, ticker, to_date, from_date):
         Output('insider_filter_dropdown', 'value')
     ],
     [
-        Input('stored_insider_stats', 'children'),
+        Input('stored_result', 'children'),
         Input('insider_filter_radio', 'value')
     ]
 )
-def populate_insiders_dropdown(stored_insider_stats, insider_filter_radio):
+def populate_insiders_dropdown(stored_result, insider_filter_radio):
     '''populate insiders filter dropdown with all insider names'''
-    # read transactions
-    insiders = pd.read_json(stored_insider_stats, orient='split').insider.values
+    # read insider statistics
+    insiders = results.get(stored_result)['insider_stats'].insider.values
     options = [{'label': i, 'value': i} for i in insiders]
     select = insiders if insider_filter_radio == 'all' else []
 
@@ -68,14 +150,9 @@ def populate_insiders_dropdown(stored_insider_stats, insider_filter_radio):
 
 # filter transactions based on filters
 @app.callback(
+    [Output('filtered_result', 'children')],
     [
-        Output('filtered_transactions', 'children'),
-        Output('filtered_insider_stats', 'children'),
-        Output('filtered_volatility_stats', 'children'),
-        Output('filtered_performence_stats', 'children'),
-    ],
-    [
-        Input('stored_transactions', 'children'),
+        Input('stored_result', 'children'),
         Input('insider_filter_dropdown', 'value'),
         Input('filter_market_trades_checkbox', 'value'),
         Input('filter_buys', 'value'),
@@ -87,17 +164,17 @@ def populate_insiders_dropdown(stored_insider_stats, insider_filter_radio):
         State('filter_transactions_unit', 'value'),
         State('filter_transactions_operator', 'value'),
         State('filter_transactions_value', 'value'),
-        State('filter_transactions_value_type', 'value')
-
+        State('filter_transactions_value_type', 'value'),
+        State('job_id', 'children')
     ]
 )
-def filter(stored_transactions, insider_filter, filter_market_trades,
+def filter(stored_result, insider_filter, filter_market_trades,
            filter_buys, filter_sells, filter_button, ticker, to_date,
-           from_date, filter_units, filter_operator, filter_value, filter_value_type):
+           from_date, filter_units, filter_operator, filter_value, filter_value_type, job_id):
     '''filter transactions and stats based on filter criteria'''
 
     # log to progress
-    control_components.progress('filtering transactions...')
+    progress.update(job_id, 'filtering transactions...', force=True)
 
     filter_market_trades = True if 'filter' in filter_market_trades else False
 
@@ -119,9 +196,11 @@ def filter(stored_transactions, insider_filter, filter_market_trades,
     else:
         filter_side = [None]
 
-    # pass filteres
+    # pass filteres to a Visualise holding the stored result
+    stored = results.get(stored_result)
+    vis = Visualise.from_features(stored['features'])
     data = vis.get_stats(
-        ticker=ticker,
+        ticker=vis.ticker,
         from_date=from_date[:10],
         to_date=to_date[:10],
         filter_insiders=insider_filter,
@@ -130,21 +209,14 @@ def filter(stored_transactions, insider_filter, filter_market_trades,
         filter_size=filter_size,
         filter_only=True)
 
-    jsons = [i.to_json(date_format='iso', orient='split') for i in data[:4]]
-
-    filtered_transactions, filtered_insider_stats, filtered_volatility_stats, filtered_performence_stats = jsons
+    # filtered statistics are drawn against the price data and features of the stored result, which are
+    # looked up through its key rather than copied into every filtered result
+    filtered_result = dict(zip(result_names, data[:4]), stored_result=stored_result)
 
     # log to progress
-    control_components.progress('None')
+    progress.update(job_id, None, force=True)
 
-    out = [
-        filtered_transactions,
-        filtered_insider_stats,
-        filtered_volatility_stats,
-        filtered_performence_stats,
-    ]
-
-    return [i for i in out]
+    return [results.put(filtered_result)]
 
 
 # Transactions tab
@@ -157,34 +229,29 @@ def filter(stored_transactions, insider_filter, filter_market_trades,
         Output('total_sell_vol', 'children'),
         Output('spy_chart', 'figure'),
         Output('vix_chart', 'figure'),
-        Output('transactions_table', 'children')
-
     ],
     [
-        Input('filtered_transactions', 'children'),
-        Input('stored_price_data', 'children'),
+        Input('filtered_result', 'children'),
         Input('volume_type_radio', 'value'),
         Input('volume_type_spy_radio', 'value'),
         Input('volume_type_vix_radio', 'value'),
-        Input('volume_type_details_radio', 'value')
+        Input('volume_type_details_radio', 'value'),
+        State('job_id', 'children')
     ]
 )
-def transaction_charts(filtered_transactions, stored_price_data,
+def transaction_charts(filtered_result,
                        volume_type_transactions, volume_type_spy, volume_type_vix,
-                       volume_type_details):
+                       volume_type_details, job_id):
     '''draw ohlc chart and update details'''
 
     # log to progress
-    control_components.progress('generating transaction charts...')
+    progress.update(job_id, 'generating transaction charts...', force=True)
 
-    # read stored transactions and price data
-    transactions = pd.read_json(filtered_transactions, orient='split')
-    price_data = pd.read_json(stored_price_data, orient='split')
-
-    # convert dates to datetime
-    transactions['transaction_period'] = pd.to_datetime(transactions.transaction_period)
-    transactions['report_period'] = pd.to_datetime(transactions.report_period)
-    price_data.index = pd.to_datetime(price_data.index)
+    # read filtered transactions and price data
+    result = results.get(filtered_result)
+    stored = results.get(result['stored_result'])
+    transactions, price_data = result['transactions'], stored['price_data']
+    vis = Visualise.from_features(stored['features'])
 
     # create ohlc chart
     ohlc_chart, details = vis.ohlc_chart(transactions, price_data, volume_type=volume_type_transactions)
@@ -202,11 +269,7 @@ def transaction_charts(filtered_transactions, stored_price_data,
     spy_chart, vix_chart = vis.index_comparison(transactions, volume_type_spy, volume_type_vix)
 
     # log to progress
-    control_components.progress('generating transaction table...')
-    transactions_table = chart_components.generate_table(transactions, max_rows=100000000)
-
-    # log to progress
-    control_components.progress('None')
+    progress.update(job_id, None, force=True)
 
     out = [
         ohlc_chart,
@@ -216,12 +279,34 @@ def transaction_charts(filtered_transactions, stored_price_data,
         total_sell_vol,
         spy_chart,
         vix_chart,
-        transactions_table
     ]
 
     return [i for i in out]
 
 
+# transactions table, one page at a time
+@app.callback(
+    [
+        Output('transactions_table', 'data'),
+        Output('transactions_table', 'columns'),
+        Output('transactions_table', 'page_count')
+    ],
+    [
+        Input('filtered_result', 'children'),
+        Input('transactions_table', 'page_current'),
+        Input('transactions_table', 'page_size'),
+        Input('transactions_table', 'sort_by'),
+        Input('transactions_table', 'filter_query')
+    ]
+)
+def transactions_table(filtered_result, page_current, page_size, sort_by, filter_query):
+    '''sort, filter and page the filtered transactions on the server'''
+    transactions = results.get(filtered_result)['transactions']
+    data, page_count = chart_components.table_page(transactions, page_current, page_size, sort_by, filter_query)
+
+    return data, chart_components.table_columns(transactions), page_count
+
+
 # insider tab
 @app.callback(
     [
@@ -231,14 +316,17 @@ def transaction_charts(filtered_transactions, stored_price_data,
         Output('trade_count', 'figure')
     ],
     [
-        Input('filtered_insider_stats', 'children'),
+        Input('filtered_result', 'children'),
         Input('total_volume_radio', 'value'),
-        Input('position_delta_radio', 'value')
+        Input('position_delta_radio', 'value'),
+        State('job_id', 'children')
     ]
 )
-def get_insider_analysis(filtered_insider_stats, total_volume_radio, position_delta_radio):
+def get_insider_analysis(filtered_result, total_volume_radio, position_delta_radio, job_id):
 
-    insider_stats = pd.read_json(filtered_insider_stats, orient='split')
+    result = results.get(filtered_result)
+    insider_stats = result['insider_stats']
+    vis = Visualise.from_features(results.get(result['stored_result'])['features'])
     total_volume_col = 'total_volume' if total_volume_radio == 'shares' else 'total_volume_dollar'
 
     # position delta col
@@ -250,7 +338,7 @@ def get_insider_analysis(filtered_insider_stats, total_volume_radio, position_de
         position_delta_col = 'position_delta_percentage'
 
     # log to progress
-    control_components.progress('generating insider charts...')
+    progress.update(job_id, 'generating insider charts...', force=True)
 
     total_volume = vis.insider_chart(insider_stats, total_volume_col)
     position_delta = vis.insider_chart(insider_stats, position_delta_col)
@@ -258,7 +346,7 @@ def get_insider_analysis(filtered_insider_stats, total_volume_radio, position_de
     trade_count = vis.insider_chart(insider_stats, 'trade_count')
 
     # log to progress
-    control_components.progress('None')
+    progress.update(job_id, None, force=True)
 
     return total_volume, position_delta, position_rotation, trade_count
 
@@ -270,34 +358,31 @@ def get_insider_analysis(filtered_insider_stats, total_volume_radio, position_de
         Output('performance_chart', 'figure')
     ],
     [
-        Input('filtered_performence_stats', 'children'),
-        Input('filtered_volatility_stats', 'children')
+        Input('filtered_result', 'children'),
+        State('job_id', 'children')
     ]
 )
-def stats(filtered_performance, filtered_volatility):
+def stats(filtered_result, job_id):
     '''get volatility and performance charts'''
-    # read in stores stats
-    performance_stats = pd.read_json(filtered_performance, orient='split')
+    # read in stored stats
+    result = results.get(filtered_result)
+    performance_stats, volatility_stats = result['performance_stats'], result['volatility_stats']
+    vis = Visualise.from_features(results.get(result['stored_result'])['features'])
 
-    json_ = json.loads(filtered_volatility)
     # create dummy data and index if empty
-    if not json_['index']:
-        json_['index'].append([(float('NaN'), 'pre'), (float('NaN'), 'post')])
-        json_['data'].append([float('NaN')] * len(json_['columns']))
-        index = pd.MultiIndex.from_tuples(json_['index'][0])
-    else:
-        index = pd.MultiIndex.from_tuples(json_['index'])
-    volatility_stats = pd.DataFrame(json_['data'], index, json_['columns'])
+    if volatility_stats.empty:
+        index = pd.MultiIndex.from_tuples([(float('NaN'), 'pre'), (float('NaN'), 'post')])
+        volatility_stats = pd.DataFrame(float('NaN'), index, volatility_stats.columns)
 
     # log to progress
-    control_components.progress('generating analysis...')
+    progress.update(job_id, 'generating analysis...', force=True)
 
     # get charts
     performance = vis.performance_chart(performance_stats)
     volatility = vis.volatility_chart(volatility_stats)
 
     # log to progress
-    control_components.progress('None')
+    progress.update(job_id, None, force=True)
 
     return volatility, performance
 
@@ -305,13 +390,37 @@ def stats(filtered_performance, filtered_volatility):
 # Update progress
 @app.callback(
     [Output('submit_button', 'children')],
-    [Input('interval_componant', 'n_intervals')]
+    [
+        Input('interval_componant', 'n_intervals'),
+        State('job_id', 'children')
+    ]
 )
-def update_progress(n):
-    text = control_components.progress(mode='r')
-    text = 'Submit' if 'None' in text else text
+def update_progress(n, job_id):
+    # progress is only known to the process running the job, other processes reset it once it has finished
+    if job_id is None or job_state(job_id) is None:
+        raise PreventUpdate
+    text = progress.get(job_id)
+    text = 'Submit' if text is None else text
     return [text]
 
 
+# show failed and cancelled jobs
+@app.callback(
+    [Output('job_status', 'children')],
+    [
+        Input('interval_componant', 'n_intervals'),
+        State('job_id', 'children')
+    ]
+)
+def job_status(n, job_id):
+    state = None if job_id is None else job_state(job_id)
+    if state is None:
+        raise PreventUpdate
+    status, error = state
+    if status not in ('failed', 'cancelled'):
+        return ['']
+    return [error if status == 'failed' else 'Cancelled']
+
+
 if __name__ == "__main__":
     app.run_server(debug=True)
@@ -4,10 +4,26 @@ Components that compose the charts, tables and radios
 import dash
 import dash_core_components as dcc
 import dash_html_components as html
+import dash_table
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
+import pandas as pd
 from .styles import styles
 
+# dash table filter operators, each with the pandas comparison it is applied with
+filter_operators = {
+    'contains': lambda values, value: values.astype(str).str.contains(str(value), case=False, regex=False),
+    'datestartswith': lambda values, value: values.astype(str).str.startswith(str(value)),
+    'ge': lambda values, value: values >= value,
+    'le': lambda values, value: values <= value,
+    'lt': lambda values, value: values < value,
+    'gt': lambda values, value: values > value,
+    'ne': lambda values, value: values != value,
+    'eq': lambda values, value: values == value,
+}
+# symbols the dash table may use in place of operator names
+filter_symbols = {'>=': 'ge', '<=': 'le', '<': 'lt', '>': 'gt', '!=': 'ne', '=': 'eq'}
+
 
 class ChartComponents():
     def __init__(self):
@@ -112,16 +128,73 @@ class ChartComponents():
 
         self.performance_chart = html.Div([dcc.Graph(id='performance_chart', style=styles['chart'])])
 
-        self.transactions_table = html.Div(id='transactions_table', style=styles['table'])
-
-    def generate_table(self, dataframe, max_rows=10):
-        return html.Table([
-            html.Thead(
-                html.Tr([html.Th(col.replace('_', ' ').upper()) for col in dataframe.columns])
-            ),
-            html.Tbody([
-                html.Tr([
-                    html.Td(dataframe.iloc[i][col]) for col in dataframe.columns
-                ]) for i in range(min(len(dataframe), max_rows))
-            ])
-        ])
+        # pages are sorted, filtered and sliced on the server, only the visible page is sent to the browser
+        self.transactions_table = html.Div([
+            dash_table.DataTable(
+                id='transactions_table',
+                columns=[],
+                page_current=0,
+                page_size=25,
+                page_action='custom',
+                sort_action='custom',
+                sort_mode='multi',
+                sort_by=[],
+                filter_action='custom',
+                filter_query='',
+                style_table={'overflowX': 'auto'},
+            )
+        ], style=styles['table'])
+
+    def table_columns(self, dataframe):
+        '''dash table column definitions for each column of dataframe'''
+        return [{'name': col.replace('_', ' ').upper(), 'id': col} for col in dataframe.columns]
+
+    def split_filter(self, filter_part):
+        '''split one part of a dash table filter query into (column, operator, value)'''
+        for operator in [*filter_operators, *filter_symbols]:
+            # operator names are followed by a space, symbols are not
+            token = f' {operator} ' if operator in filter_operators else operator
+            if token not in filter_part:
+                continue
+            name_part, value_part = filter_part.split(token, 1)
+            name = name_part[name_part.find('{') + 1: name_part.rfind('}')]
+            value_part = value_part.strip()
+            quote = value_part[:1]
+            if quote in ('"', "'", '`') and value_part[-1:] == quote:
+                value = value_part[1:-1].replace('\\' + quote, quote)
+            elif operator in ('contains', 'datestartswith'):
+                value = value_part
+            else:
+                try:
+                    value = float(value_part)
+                except ValueError:
+                    value = value_part
+            return name, filter_symbols.get(operator, operator), value
+        return None, None, None
+
+    def table_page(self, dataframe, page_current=0, page_size=25, sort_by=None, filter_query=''):
+        '''filter, sort and slice dataframe to one page of the dash table
+
+        returns the page's records and the number of pages
+        '''
+        for filter_part in (filter_query or '').split(' && '):
+            column, operator, value = self.split_filter(filter_part)
+            if column not in dataframe.columns:
+                continue
+            try:
+                dataframe = dataframe[filter_operators[operator](dataframe[column], value)]
+            except TypeError:
+                # values that can not be compared with the column (e.g. text for a number) are ignored
+                continue
+        if sort_by:
+            dataframe = dataframe.sort_values(
+                [col['column_id'] for col in sort_by],
+                ascending=[col['direction'] == 'asc' for col in sort_by],
+                kind='mergesort'
+            )
+        page_count = max(-(-len(dataframe) // page_size), 1)
+        page = dataframe.iloc[page_current * page_size:(page_current + 1) * page_size].copy()
+        # dates are shown without their time
+        for col in page.columns[page.dtypes.map(pd.api.types.is_datetime64_any_dtype)]:
+            page[col] = page[col].dt.strftime('%Y-%m-%d')
+        return page.astype(object).where(page.notna(), None).to_dict('records'), page_count
@@ -94,6 +94,13 @@ class ControlComponents():
                 id='submit_button',
                 style={'background': '#119dff8c', 'width': '90%', 'margin': 'auto'}
             ),
+            html.Button(
+                'Cancel',
+                id='cancel_button',
+                style={'width': '90%', 'margin': 'auto'}
+            ),
+            # failed or cancelled jobs
+            html.Div(id='job_status', style={'textAlign': 'center', 'color': 'red'}),
             dcc.Interval('interval_componant', interval=1000, n_intervals=0)
         ])
 
@@ -186,32 +193,12 @@ class ControlComponents():
 
         ], style=styles['filter_transactions'])
 
+        # keys of the results saved in the server side result cache
         self.stored_data = html.Div([
-            html.Div(id='stored_transactions'),
-            html.Div(id='stored_insider_stats'),
-            html.Div(id='stored_volatility_stats'),
-            html.Div(id='stored_performence_stats'),
-            html.Div(id='stored_price_data'),
-            html.Div(id='stored_spy_data'),
-            html.Div(id='stored_vix_data'),
+            html.Div(id='job_id'),
+            html.Div(id='stored_result'),
         ], style={'display': 'none'})
 
         self.filtered_data = html.Div([
-            html.Div(id='filtered_transactions'),
-            html.Div(id='filtered_insider_stats'),
-            html.Div(id='filtered_volatility_stats'),
-            html.Div(id='filtered_performence_stats')
+            html.Div(id='filtered_result'),
         ], style={'display': 'none'})
-
-    def progress(self, text=None, path='app_components/progress.txt', mode='w'):
-        '''helper function to read/write from progress.txt'''
-        if mode == 'r':
-            with open(path, mode) as file:
-                text = file.read()
-                file.close()
-                return text
-
-        with open(path, mode) as file:
-            assert text != None, 'text required'
-            file.write(text)
-            file.close()
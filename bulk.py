@@ -0,0 +1,69 @@
+'''
+Scrape form 4 transactions for many tickers concurrently
+'''
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import pandas as pd
+
+from scraper import Form4Scraper, session
+
+
+def scrape_ticker(ticker, from_date, to_date, fetch_workers=1, session=session):
+    '''scrape one ticker with its own scraper, returns a report row'''
+    start = time.perf_counter()
+    report = {'ticker': ticker.upper(), 'status': 'ok', 'transactions': 0, 'error': None}
+    try:
+        # a new scraper per ticker so no state is shared between workers
+        scraper = Form4Scraper(workers=fetch_workers, session=session)
+        report['transactions'] = len(scraper.form4_data(ticker, from_date, to_date))
+    except Exception as e:
+        report['status'] = 'failed'
+        report['error'] = f'{type(e).__name__}: {e}'
+    report['seconds'] = time.perf_counter() - start
+    return report
+
+
+def scrape_many(tickers, from_date='', to_date='', workers=4, fetch_workers=1, session=session):
+    '''scrape form 4 transactions for each ticker and save them to the local store
+
+    tickers - list of tickers to scrape
+    from_date, to_date - search range as in Form4Scraper.form4_data
+    workers - number of tickers scraped at once
+    fetch_workers - number of xml files each ticker downloads at once
+    session - EdgarSession shared by every worker, its token bucket limits the combined request rate
+
+    returns a dataframe reporting the status, number of transactions and time taken for each ticker
+    '''
+    tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        reports = list(executor.map(
+            lambda ticker: scrape_ticker(ticker, from_date, to_date, fetch_workers, session), tickers
+        ))
+    return pd.DataFrame(reports, columns=['ticker', 'status', 'transactions', 'seconds', 'error'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scrape form 4 transactions for many tickers')
+    parser.add_argument('tickers', nargs='*', help='tickers to scrape')
+    parser.add_argument('--watchlist', help='file with one ticker per line')
+    parser.add_argument('--from-date', default='', help='latest filing date to search from (YYYY-MM-DD)')
+    parser.add_argument('--to-date', required=True, help='earliest filing date to search to (YYYY-MM-DD)')
+    parser.add_argument('--workers', type=int, default=4, help='number of tickers scraped at once')
+    parser.add_argument('--fetch-workers', type=int, default=1, help='number of xml files each ticker downloads at once')
+    args = parser.parse_args()
+
+    tickers = list(args.tickers)
+    if args.watchlist:
+        with open(args.watchlist, 'r') as file:
+            tickers += [line.strip() for line in file if line.strip() and not line.startswith('#')]
+    if not tickers:
+        parser.error('no tickers given')
+
+    start = time.perf_counter()
+    report = scrape_many(tickers, args.from_date, args.to_date, args.workers, args.fetch_workers)
+    minutes = (time.perf_counter() - start) / 60
+    print(report.to_string(index=False))
+    print(f"\n{(report.status == 'ok').sum()}/{len(report)} tickers scraped, {len(report) / minutes:.1f} tickers/min")
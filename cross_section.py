@@ -0,0 +1,159 @@
+'''
+Cross-sectional insider statistics for many tickers loaded from the local store
+'''
+
+import argparse
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from stat_kernels import (
+    commonstock_transactions, forward_returns, horizons, insider_statistics, open_market_mask, split_adjust,
+    window_volatility
+)
+from transaction_store import TransactionStore, categorical_columns
+from price_providers import provider
+
+
+class CrossSectionStats():
+    '''insider, volatility and return statistics of many tickers held in one long format frame
+
+    store - TransactionStore the tickers are read from, scrape them first with bulk.py
+    horizons - dictionary of label: relativedelta used for volatility and return periods
+    log_returns - calculate volatility of daily log returns rather than prices
+    price_provider - source of price and split data, see price_providers
+    '''
+    def __init__(self, store=None, horizons=horizons, log_returns=False, price_provider=provider):
+        self.store = TransactionStore() if store is None else store
+        self.price_provider = price_provider
+        self.horizons = horizons
+        self.log_returns = log_returns
+        self.commonstock_transactions = None
+        self.price_data = {}
+
+    def load(self, tickers, start=None, end=None):
+        '''read commonstock transactions of every ticker reported between start and end into one frame
+
+        tickers without saved transactions are skipped, the ticker column is categorical
+        '''
+        frames = []
+        for ticker in dict.fromkeys(ticker.upper() for ticker in tickers):
+            if not self.store.exists(ticker):
+                print(f"No saved transactions for {ticker}, skipping")
+                continue
+            transactions = commonstock_transactions(self.store.read(ticker, start=start, end=end))
+            transactions.insert(0, 'ticker', ticker)
+            frames.append(transactions)
+        if not frames:
+            raise Exception("No commonstock transactions found for any ticker")
+        transactions = pd.concat(frames, ignore_index=True)
+        # categories of each ticker's frame are merged so repeated strings stay categorical
+        for column in ['ticker', *categorical_columns]:
+            transactions[column] = transactions[column].astype('category')
+        self.commonstock_transactions = transactions
+        self.price_data = {}
+        return transactions
+
+    def get_price_data(self):
+        '''get historical price and split data for each ticker and split adjust its transactions'''
+        adjusted = []
+        for ticker, transactions in self.commonstock_transactions.groupby('ticker', observed=True, sort=False):
+            start = transactions.transaction_period.min() - relativedelta(weeks=4)
+            self.price_data[ticker] = self.price_provider.prices(ticker, start=start)
+            adjusted.append(split_adjust(transactions, self.price_provider.splits(ticker, start=start)))
+        adjusted = pd.concat(adjusted)
+        for column in adjusted.columns:
+            self.commonstock_transactions[column] = adjusted[column]
+
+    def get_transaction_features(self):
+        '''calculate returns, the open market flag and volatility of every transaction, ticker by ticker
+
+        transaction_features is indexed like commonstock_transactions, volatility_stats by
+        (ticker, transaction_date, period)
+        '''
+        features, volatility = [], {}
+        for ticker, transactions in self.commonstock_transactions.groupby('ticker', observed=True, sort=False):
+            price_data = self.price_data[ticker]
+            ticker_features = forward_returns(transactions.transaction_period, price_data.Close, self.horizons)
+            ticker_features.index = transactions.index
+            ticker_features['open_market'] = open_market_mask(transactions, price_data)
+            features.append(ticker_features)
+            transaction_dates = transactions.transaction_period.drop_duplicates()
+            volatility[ticker] = window_volatility(transaction_dates, price_data.Close, self.horizons, self.log_returns)
+        self.transaction_features = pd.concat(features).reindex(self.commonstock_transactions.index)
+        self.volatility_stats = pd.concat(volatility, names=['ticker'])
+
+    def get_data(self, tickers, start=None, end=None):
+        '''load tickers and calculate the statistics of every transaction
+
+        returns commonstock transactions (with return_<label> and open_market columns), insider statistics
+        and volatility statistics
+        '''
+        self.load(tickers, start, end)
+        self.get_price_data()
+        self.get_transaction_features()
+        transactions = self.commonstock_transactions.join(self.transaction_features)
+        return transactions, self.insider_statistics(), self.volatility_stats
+
+    def insider_statistics(self, transactions=None):
+        '''statistics of each insider of each ticker, see stat_kernels.insider_statistics'''
+        transactions = self.commonstock_transactions if transactions is None else transactions
+        return insider_statistics(transactions, keys=('ticker', 'name'))
+
+    def recent(self, days=30, as_of=None, code=None):
+        '''transactions made in the days before as_of (default today), only those with code if given'''
+        as_of = pd.Timestamp.today().normalize() if as_of is None else pd.Timestamp(as_of)
+        transactions = self.commonstock_transactions
+        period = transactions.transaction_period
+        mask = (period > as_of - pd.Timedelta(days=days)) & (period <= as_of)
+        if code is not None:
+            mask &= transactions.code == code
+        return transactions[mask]
+
+    def cluster_buys(self, days=30, as_of=None, min_insiders=2, top=10):
+        '''tickers where the most insiders bought in the days before as_of
+
+        returns dataframe of ticker, insiders, trade_count, shares, amount, first_trade and last_trade,
+        ranked by the number of buying insiders then the dollar amount bought
+        '''
+        buys = self.recent(days, as_of, code='P')
+        clusters = buys.groupby('ticker', observed=True).agg(
+            insiders=('name', 'nunique'),
+            trade_count=('name', 'size'),
+            shares=('shares', 'sum'),
+            amount=('amount', 'sum'),
+            first_trade=('transaction_period', 'min'),
+            last_trade=('transaction_period', 'max'),
+        )
+        clusters = clusters[clusters.insiders >= min_insiders]
+        clusters = clusters.sort_values(['insiders', 'amount'], ascending=False).head(top)
+        return clusters.reset_index()
+
+    def rank_insiders(self, by='position_delta_dollar', days=None, as_of=None, top=10, ascending=False):
+        '''insiders of every ticker ranked by a column of their statistics
+
+        days - only count transactions made in the days before as_of, every transaction if None
+        '''
+        transactions = None if days is None else self.recent(days, as_of)
+        stats = self.insider_statistics(transactions)
+        return stats.sort_values(by, ascending=ascending).head(top).reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rank cluster buys across tickers in the local store')
+    parser.add_argument('tickers', nargs='*', help='tickers to rank')
+    parser.add_argument('--watchlist', help='file with one ticker per line')
+    parser.add_argument('--days', type=int, default=30, help='number of days before --as-of to look at')
+    parser.add_argument('--as-of', default=None, help='last day of the window (YYYY-MM-DD), default today')
+    parser.add_argument('--min-insiders', type=int, default=2, help='minimum number of insiders buying')
+    parser.add_argument('--top', type=int, default=10, help='number of tickers shown')
+    args = parser.parse_args()
+
+    tickers = list(args.tickers)
+    if args.watchlist:
+        with open(args.watchlist, 'r') as file:
+            tickers += [line.strip() for line in file if line.strip()]
+
+    stats = CrossSectionStats()
+    stats.load(tickers)
+    print(stats.cluster_buys(args.days, args.as_of, args.min_insiders, args.top).to_string(index=False))
@@ -0,0 +1,93 @@
+'''
+Form 4 xml parser built on lxml
+'''
+
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Union
+
+from lxml import etree
+import numpy as np
+
+
+class Transaction(NamedTuple):
+    '''non derivative transaction reported in a form 4 filing'''
+    transaction_period: datetime
+    security: str
+    code: str
+    shares: float
+    price: float
+    post_transaction_shares: float
+    ownership_nature: str
+
+
+class Form4(NamedTuple):
+    '''form 4 header fields and its non derivative transactions'''
+    report_period: datetime
+    issuer_cik: Optional[int]
+    name: str
+    isDirector: Union[str, int]
+    isOfficer: Union[str, int]
+    isTenPercentOwner: Union[str, int]
+    officerTitle: Union[str, int]
+    transactions: List[Transaction]
+
+
+# recover from the occasional malformed filing instead of failing the whole scrape
+parser = etree.XMLParser(recover=True, huge_tree=True)
+
+
+def text(element):
+    '''all text within element, like BeautifulSoup's .text'''
+    return ''.join(element.itertext())
+
+
+def value(element, tag):
+    '''text of the value element nested in the first tag found under element'''
+    return text(element.find(f'.//{tag}').find('.//value'))
+
+
+def parse_date(date):
+    '''parse the date part of a form 4 date string'''
+    return datetime.strptime(date[:10], '%Y-%m-%d')
+
+
+def parse_transaction(transaction):
+    '''create Transaction from a nonDerivativeTransaction element'''
+    shares = float(value(transaction, 'transactionShares'))
+    # if securities desposed use negitive amount
+    if value(transaction, 'transactionAcquiredDisposedCode') == 'D':
+        shares = -shares
+    # if price per share not available use NaN
+    try:
+        price = float(value(transaction, 'transactionPricePerShare'))
+    except (AttributeError, TypeError, ValueError):
+        price = np.nan
+    return Transaction(
+        transaction_period=parse_date(value(transaction, 'transactionDate')),
+        security=value(transaction, 'securityTitle'),
+        code=text(transaction.find('.//transactionCode')),
+        shares=shares,
+        price=price,
+        post_transaction_shares=float(value(transaction, 'sharesOwnedFollowingTransaction')),
+        ownership_nature=value(transaction, 'directOrIndirectOwnership'),
+    )
+
+
+def parse_form4(content):
+    '''parse form 4 xml, header fields are read once for the whole document'''
+    root = etree.fromstring(content, parser)
+    # relationship tags are optional, 0 if not found
+    relationship = {}
+    for tag in ['isDirector', 'isOfficer', 'isTenPercentOwner', 'officerTitle']:
+        element = root.find(f'.//{tag}')
+        relationship[tag] = text(element) if element is not None else 0
+    name = root.find('.//rptOwnerName')
+    # the company whose shares were traded, the reporting owner may be a listed company too
+    issuer_cik = root.find('.//issuerCik')
+    return Form4(
+        report_period=parse_date(text(root.find('.//periodOfReport'))),
+        issuer_cik=int(text(issuer_cik)) if issuer_cik is not None and text(issuer_cik).strip() else None,
+        name=text(name) if name is not None else np.nan,
+        transactions=[parse_transaction(transaction) for transaction in root.iter('nonDerivativeTransaction')],
+        **relationship
+    )
@@ -0,0 +1,142 @@
+'''
+Background queue running long scrapes and statistics off the app's request threads
+'''
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import uuid
+
+
+class JobCancelled(Exception):
+    '''raised inside a job when it has been cancelled'''
+
+
+class Job():
+    '''a function queued to run in the background
+
+    status - queued, running, done, failed or cancelled
+    result - return value of the function once done
+    error - description of the exception raised if failed
+    callers - number of submits sharing the job that have not cancelled it
+    '''
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.callers = 1
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.future = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed', 'cancelled')
+
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def check(self):
+        '''raise JobCancelled if the job has been cancelled, long running jobs call this between steps'''
+        if self.cancelled():
+            raise JobCancelled(f"Job {self.id} cancelled")
+
+
+class JobQueue():
+    '''run jobs on a pool of worker threads, a job submitted while an equal one is unfinished joins it
+
+    workers - number of jobs run at once
+    max_jobs - number of finished jobs remembered, the oldest are forgotten first
+    on_finish - function called with each job once it is done, failed or cancelled, e.g. to share its status
+                with other processes
+    '''
+    def __init__(self, workers=2, max_jobs=256, on_finish=None):
+        self.executor = ThreadPoolExecutor(max_workers=max(workers, 1))
+        self.max_jobs = max_jobs
+        self.on_finish = on_finish
+        self.jobs = OrderedDict()
+        self.active = {}
+        self.lock = threading.Lock()
+
+    def submit(self, key, function, *args, previous=None, **kwargs):
+        '''queue function(job, *args, **kwargs), returns the id of the job
+
+        key - identifies equal jobs, e.g. ('stats', ticker, from_date, to_date)
+        previous - id of the job the caller submitted last, submitting again while it runs doesn't make the
+                   caller count twice so one cancel still stops it
+        '''
+        with self.lock:
+            # cancelled jobs still running are not joined
+            if key in self.active and not self.active[key].cancelled():
+                job = self.active[key]
+                if job.id != previous:
+                    job.callers += 1
+                return job.id
+            job = Job(key)
+            self.jobs[job.id] = job
+            self.active[key] = job
+            self.forget()
+            job.future = self.executor.submit(self.run, job, function, *args, **kwargs)
+        return job.id
+
+    def run(self, job, function, *args, **kwargs):
+        '''run function recording the job's status and result'''
+        try:
+            job.check()
+            job.status = 'running'
+            job.result = function(job, *args, **kwargs)
+            job.status = 'done'
+        except JobCancelled:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.error = f'{type(e).__name__}: {e}'
+            job.status = 'failed'
+        finally:
+            with self.lock:
+                if self.active.get(job.key) is job:
+                    del self.active[job.key]
+            self.finish(job)
+
+    def finish(self, job):
+        '''report a finished job to on_finish'''
+        if self.on_finish is not None:
+            self.on_finish(job)
+
+    def forget(self):
+        '''forget the oldest finished jobs above max_jobs'''
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(len(self.jobs) - self.max_jobs, 0)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id):
+        '''job with job_id, None if unknown'''
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def status(self, job_id):
+        '''status of the job, unknown if it does not exist or has been forgotten'''
+        job = self.get(job_id)
+        return 'unknown' if job is None else job.status
+
+    def cancel(self, job_id):
+        '''leave a job, it is cancelled once every submit sharing it has left
+
+        queued jobs never start and running jobs stop at their next check, returns whether the job was cancelled
+        '''
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            # other requests are still waiting for the result
+            job.callers = max(job.callers - 1, 0)
+            if job.callers > 0:
+                return False
+            job.cancel_event.set()
+        if job.future.cancel():
+            job.status = 'cancelled'
+            with self.lock:
+                if self.active.get(job.key) is job:
+                    del self.active[job.key]
+            self.finish(job)
+        return True
@@ -0,0 +1,189 @@
+'''
+Bulk load form 4 filings for the whole market from EDGAR's master/form index files
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import argparse
+import csv
+import json
+
+import pandas as pd
+from tqdm import tqdm
+
+from form4_parser import parse_form4
+from scraper import Form4Scraper, session, submission_xml
+
+
+class MasterIndexLoader():
+    '''select form 4 filings from EDGAR index files and save their transactions to the store
+
+    ticker_map_path - json file in the format of the SEC's company_tickers.json or a csv file
+                      with cik and ticker columns, filings of companies not in it are skipped
+    workers - number of filings downloaded at once
+    '''
+    def __init__(self, ticker_map_path=Path('saved_transactions/company_tickers.json'), workers=4, session=session):
+        self.index_endpoint = "https://www.sec.gov/Archives/edgar"
+        self.session = session
+        self.workers = workers
+        self.scraper = Form4Scraper(workers=workers, session=session)
+        self.store = self.scraper.store
+        self.tickers = self.load_ticker_map(ticker_map_path)
+
+    def load_ticker_map(self, path):
+        '''dictionary of cik: ticker'''
+        path = Path(path)
+        with open(path, 'r') as file:
+            if path.suffix == '.json':
+                companies = json.load(file)
+                companies = companies.values() if isinstance(companies, dict) else companies
+                rows = [(company['cik_str'], company['ticker']) for company in companies]
+            else:
+                rows = [(row['cik'], row['ticker']) for row in csv.DictReader(file)]
+        tickers = {}
+        # the first ticker listed for a cik is its primary share class
+        for cik, ticker in rows:
+            tickers.setdefault(int(cik), ticker.upper())
+        return tickers
+
+    def index_urls(self, start, end, daily=False):
+        '''urls of the quarterly (or daily) master index files covering start to end'''
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        if daily:
+            dates = pd.bdate_range(start, end)
+            return [
+                f"{self.index_endpoint}/daily-index/{date.year}/QTR{date.quarter}/master.{date.strftime('%Y%m%d')}.idx"
+                for date in dates
+            ]
+        quarters = pd.period_range(start, end, freq='Q')
+        return [f"{self.index_endpoint}/full-index/{quarter.year}/QTR{quarter.quarter}/master.idx" for quarter in quarters]
+
+    def read_index(self, content):
+        '''parse a master.idx (pipe delimited) or form.idx (fixed width) index file
+
+        returns dataframe of cik, company, form_type, date_filed and filename
+        '''
+        lines = content.decode('latin-1').splitlines() if isinstance(content, bytes) else content.splitlines()
+        # the column headings are the line before the row of dashes
+        start = [i for i, line in enumerate(lines) if line.startswith('-----')][0]
+        header, rows = lines[start - 1], [line for line in lines[start + 1:] if line.strip()]
+        if '|' in header:
+            rows = [row.split('|') for row in rows]
+            index = pd.DataFrame(rows, columns=['cik', 'company', 'form_type', 'date_filed', 'filename'])
+        else:
+            # fixed width columns start where their headings start
+            starts = [header.index(column) for column in ['Form Type', 'Company Name', 'CIK', 'Date Filed', 'File Name']]
+            bounds = list(zip(starts, starts[1:] + [None]))
+            rows = [[row[i:j].strip() for i, j in bounds] for row in rows]
+            index = pd.DataFrame(rows, columns=['form_type', 'company', 'cik', 'date_filed', 'filename'])
+        index['cik'] = index.cik.astype(int)
+        # daily index files use dates without dashes
+        index['date_filed'] = pd.to_datetime(index.date_filed.str.replace('-', ''), format='%Y%m%d')
+        return index[['cik', 'company', 'form_type', 'date_filed', 'filename']]
+
+    def get_index(self, start, end, index_files=None, daily=False):
+        '''read index files, local paths if given otherwise downloaded from EDGAR'''
+        if index_files is None:
+            contents = []
+            for url in self.index_urls(start, end, daily):
+                response = self.session.get(url)
+                # daily index files do not exist for market holidays
+                if response.status_code == 200:
+                    contents.append(response.content)
+        else:
+            contents = [Path(path).read_bytes() for path in index_files]
+        if not contents:
+            raise ValueError(f"No index files found between {start} and {end}")
+        return pd.concat([self.read_index(content) for content in contents], ignore_index=True)
+
+    def select_filings(self, index, start, end, form_types=('4',)):
+        '''form 4 filings listed under a company in the ticker map filed between start and end (inclusive)
+
+        each filing is listed under the issuer and its reporting owners, and an owner can be a listed company
+        too, so a filing can be listed under several mapped ciks. it is selected once, with the tickers of every
+        mapped cik it is listed under, and saved under its issuer once it has been fetched
+        '''
+        filings = index[
+            index.form_type.isin(form_types) &
+            (index.date_filed >= pd.Timestamp(start)) &
+            (index.date_filed <= pd.Timestamp(end)) &
+            index.cik.isin(self.tickers)
+        ].copy()
+        filings['accession'] = filings.filename.str.extract(r'(\d{10}-\d{2}-\d{6})', expand=False).str.replace('-', '')
+        tickers = filings.groupby('accession').cik.agg(lambda ciks: tuple(sorted({self.tickers[cik] for cik in ciks})))
+        filings.drop_duplicates('accession', inplace=True)
+        filings['tickers'] = filings.accession.map(tickers)
+        filings.sort_values(['tickers', 'date_filed'], ascending=[True, False], inplace=True)
+        return filings[['accession', 'tickers', 'date_filed', 'form_type', 'filename']].reset_index(drop=True)
+
+    def fetch_filing(self, filename):
+        '''xml document of a filing from its complete submission text file'''
+        response = self.session.get(f"{self.index_endpoint}/{filename.replace('edgar/', '', 1)}")
+        return submission_xml(response.content)[1] if response.status_code == 200 else None
+
+    def load(self, start, end, index_files=None, daily=False, chunk_size=1000):
+        '''save transactions of every form 4 filed between start and end to the store
+
+        index_files - local index files to read instead of downloading them
+        daily - use daily index files rather than quarterly ones
+        chunk_size - number of filings downloaded before their transactions are saved
+
+        returns a dataframe with the number of filings and transactions saved for each ticker
+        '''
+        filings = self.select_filings(self.get_index(start, end, index_files, daily), start, end)
+        # skip filings that have already been saved under any of the tickers they are listed under
+        saved = {ticker: self.store.accessions(ticker) for ticker in set(filings.tickers.explode())}
+        filings = filings[[
+            not any(accession in saved[ticker] for ticker in tickers)
+            for accession, tickers in zip(filings.accession, filings.tickers)
+        ]]
+        print(f"Extracting data from {len(filings)} files...\n")
+
+        report = {}
+        with ThreadPoolExecutor(max_workers=max(self.workers, 1)) as executor:
+            for chunk_start in tqdm(range(0, len(filings), chunk_size), desc='Extracting Data'):
+                chunk = filings.iloc[chunk_start:chunk_start + chunk_size]
+                # rows of each issuer's ticker, filings of issuers not in the ticker map are skipped
+                rows, filing_dates = {}, {}
+                for accession, tickers, date_filed, content in zip(
+                    chunk.accession, chunk.tickers, chunk.date_filed, executor.map(self.fetch_filing, chunk.filename)
+                ):
+                    if content is None:
+                        continue
+                    form4 = parse_form4(content)
+                    if form4.issuer_cik is None:
+                        # no issuer in the document, only trust the index if the filing is listed under one company
+                        ticker = tickers[0] if len(tickers) == 1 else None
+                    else:
+                        ticker = self.tickers.get(form4.issuer_cik)
+                    if ticker is None:
+                        continue
+                    ticker_rows = rows.setdefault(ticker, {key: [] for key in self.scraper.transaction_information})
+                    for key, values in self.scraper.form4_rows(accession, form4).items():
+                        ticker_rows[key].extend(values)
+                    filing_dates.setdefault(ticker, {})[accession] = date_filed.to_pydatetime()
+                for ticker, ticker_rows in sorted(rows.items()):
+                    transactions = pd.DataFrame(ticker_rows)
+                    transactions.report_period = pd.to_datetime(transactions.report_period)
+                    transactions.transaction_period = pd.to_datetime(transactions.transaction_period)
+                    with self.store.lock(ticker):
+                        self.store.append(ticker, transactions, filing_dates[ticker])
+                    filings_saved, transactions_saved = report.get(ticker, (0, 0))
+                    report[ticker] = (filings_saved + transactions.accession.nunique(), transactions_saved + len(transactions))
+        return pd.DataFrame(
+            [(ticker, *report[ticker]) for ticker in sorted(report)], columns=['ticker', 'filings', 'transactions']
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load form 4 filings for every company in the ticker map')
+    parser.add_argument('start', help='earliest filing date (YYYY-MM-DD)')
+    parser.add_argument('end', help='latest filing date (YYYY-MM-DD)')
+    parser.add_argument('--index-files', nargs='*', help='local master.idx/form.idx files to read')
+    parser.add_argument('--daily', action='store_true', help='use daily rather than quarterly index files')
+    parser.add_argument('--ticker-map', default='saved_transactions/company_tickers.json', help='cik to ticker mapping file')
+    parser.add_argument('--workers', type=int, default=4, help='number of filings downloaded at once')
+    args = parser.parse_args()
+
+    loader = MasterIndexLoader(args.ticker_map, workers=args.workers)
+    print(loader.load(args.start, args.end, args.index_files, args.daily).to_string(index=False))
@@ -0,0 +1,209 @@
+'''
+Sources of daily price and split data, with an on-disk cache that only downloads missing date ranges
+'''
+
+from pathlib import Path
+import json
+import os
+import threading
+
+import pandas as pd
+
+
+# DataReader's default start date
+default_start = pd.Timestamp('2010-01-01')
+# daily bars change until the exchange's session closes
+exchange_timezone = 'America/New_York'
+session_close = pd.Timedelta(hours=16)
+
+
+def date_range(start, end):
+    '''start and end as timestamps, empty start defaults to default_start and empty end to today'''
+    start = default_start if start is None or start == '' else pd.Timestamp(start)
+    end = pd.Timestamp.today().normalize() if end is None or end == '' else pd.Timestamp(end)
+    return start, end
+
+
+def empty_splits():
+    '''split data without any splits'''
+    return pd.DataFrame({'value': pd.Series(dtype=float)}, index=pd.DatetimeIndex([], name='Date'))
+
+
+class PriceProvider():
+    '''source of daily OHLC prices and splits
+
+    prices returns a dataframe with High, Low, Open, Close, Volume and Adj Close columns indexed by date,
+    splits a dataframe with the split value (e.g. 0.25 for a 4 for 1 split) indexed by date
+    '''
+    def prices(self, ticker, start=None, end=None):
+        raise NotImplementedError
+
+    def splits(self, ticker, start=None, end=None):
+        raise NotImplementedError
+
+
+class YahooProvider(PriceProvider):
+    '''prices and splits downloaded from yahoo finance, needs pandas_datareader'''
+    def prices(self, ticker, start=None, end=None):
+        # imported when used so local and cached prices can be read without it
+        from pandas_datareader import DataReader
+        from pandas_datareader._utils import RemoteDataError
+        start, end = date_range(start, end)
+        try:
+            return DataReader(ticker, 'yahoo', start, end)
+        except (KeyError, RemoteDataError):
+            # yahoo returns no data for ranges without a trading day
+            if end - start < pd.Timedelta(days=7):
+                return pd.DataFrame(columns=['High', 'Low', 'Open', 'Close', 'Volume', 'Adj Close'],
+                                    index=pd.DatetimeIndex([], name='Date'))
+            raise
+
+    def splits(self, ticker, start=None, end=None):
+        from pandas_datareader import DataReader
+        start, end = date_range(start, end)
+        actions = DataReader(ticker, 'yahoo-actions', start, end)
+        if len(actions) == 0:
+            return empty_splits()
+        return actions.loc[actions.action == 'SPLIT', ['value']].sort_index()
+
+
+class LocalProvider(PriceProvider):
+    '''prices and splits read from <TICKER>.parquet/.csv and <TICKER>_splits.parquet/.csv files
+
+    csv files have the date in their first column, tickers without a splits file have no splits
+    '''
+    def __init__(self, path=Path('saved_transactions/prices')):
+        self.path = Path(path)
+
+    def read(self, name):
+        '''dataframe saved as name.parquet or name.csv, None if neither exists'''
+        parquet_path, csv_path = self.path / f'{name}.parquet', self.path / f'{name}.csv'
+        if parquet_path.exists():
+            return pd.read_parquet(parquet_path)
+        if csv_path.exists():
+            return pd.read_csv(csv_path, index_col=0, parse_dates=True)
+        return None
+
+    def prices(self, ticker, start=None, end=None):
+        prices = self.read(ticker.upper())
+        if prices is None:
+            raise FileNotFoundError(f"No price data for {ticker.upper()} in {self.path}")
+        start, end = date_range(start, end)
+        return prices.sort_index().loc[start:end]
+
+    def splits(self, ticker, start=None, end=None):
+        splits = self.read(f'{ticker.upper()}_splits')
+        if splits is None:
+            return empty_splits()
+        start, end = date_range(start, end)
+        return splits.sort_index().loc[start:end, ['value']]
+
+
+class CachedProvider(PriceProvider):
+    '''cache of another provider's prices and splits, only date ranges not yet cached are requested
+
+    provider - provider the cache is filled from
+    path - directory holding the cached <TICKER>.parquet, <TICKER>_splits.parquet and <TICKER>.json coverage
+    max_age - age after which a bar saved during its trading session is requested again while the session is
+              still open, once the session has closed it is requested again regardless of its age
+    '''
+    def __init__(self, provider, path=Path('saved_transactions/prices'), max_age=pd.Timedelta(hours=1)):
+        self.provider = provider
+        self.local = LocalProvider(path)
+        self.path = Path(path)
+        self.max_age = max_age
+        self.lock = threading.Lock()
+
+    def coverage(self, ticker):
+        '''date range (start, end, updated) cached for ticker, None if nothing is cached'''
+        try:
+            with open(self.path / f'{ticker}.json', 'r') as file:
+                coverage = json.load(file)
+        except FileNotFoundError:
+            return None
+        updated = pd.Timestamp(coverage['updated'])
+        # update times saved without a timezone are read as exchange time
+        updated = updated.tz_localize(exchange_timezone) if updated.tz is None else updated.tz_convert(exchange_timezone)
+        return pd.Timestamp(coverage['start']), pd.Timestamp(coverage['end']), updated
+
+    def missing(self, ticker, start, end):
+        '''date ranges between start and end not covered by the cache'''
+        coverage = self.coverage(ticker)
+        if coverage is None:
+            return [(start, end)]
+        cached_start, cached_end, updated = coverage
+        day = pd.Timedelta(days=1)
+        ranges = []
+        if start < cached_start:
+            ranges.append((start, cached_start - day))
+        # bars saved before cached_end's session closed were still changing, they are requested again from the
+        # day they were saved once the session has closed, or while it is open once they are older than max_age
+        now = pd.Timestamp.now(tz=exchange_timezone)
+        close = (cached_end + session_close).tz_localize(exchange_timezone)
+        updated_date = updated.tz_localize(None).normalize()
+        refresh = updated < close and end >= updated_date and (now >= close or now - updated > self.max_age)
+        if end > cached_end or refresh:
+            # ranges are extended to the cache so it always covers one continuous range
+            range_start = min(updated_date, cached_end + day) if refresh else cached_end + day
+            ranges.append((range_start, max(end, cached_end)))
+        return ranges
+
+    def save(self, name, data):
+        '''write data to name.parquet, replacing the file atomically'''
+        path = self.path / f'{name}.parquet'
+        temp_path = path.with_suffix('.tmp')
+        data.to_parquet(temp_path)
+        os.replace(temp_path, path)
+
+    def update(self, ticker, start, end):
+        '''request the ranges of ticker missing from the cache between start and end'''
+        ranges = self.missing(ticker, start, end)
+        if not ranges:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        prices = [self.local.read(ticker)]
+        splits = [self.local.read(f'{ticker}_splits')]
+        for range_start, range_end in ranges:
+            prices.append(self.provider.prices(ticker, range_start, range_end))
+            splits.append(self.provider.splits(ticker, range_start, range_end))
+        for name, frames in [(ticker, prices), (f'{ticker}_splits', splits)]:
+            data = pd.concat([frame for frame in frames if frame is not None])
+            # the latest request replaces rows it shares with the cache
+            data = data[~data.index.duplicated(keep='last')].sort_index()
+            self.save(name, data)
+
+        coverage = self.coverage(ticker)
+        if coverage is not None:
+            start, end = min(start, coverage[0]), max(end, coverage[1])
+        temp_path = self.path / f'{ticker}.json.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump({
+                'start': str(start.date()),
+                'end': str(end.date()),
+                'updated': str(pd.Timestamp.now(tz=exchange_timezone))
+            }, file)
+        os.replace(temp_path, self.path / f'{ticker}.json')
+
+    def prices(self, ticker, start=None, end=None):
+        ticker = ticker.upper()
+        start, end = date_range(start, end)
+        # today's bar is the latest available
+        end = min(end, pd.Timestamp.today().normalize())
+        with self.lock:
+            self.update(ticker, start, end)
+        return self.local.prices(ticker, start, end)
+
+    def splits(self, ticker, start=None, end=None):
+        ticker = ticker.upper()
+        start, end = date_range(start, end)
+        end = min(end, pd.Timestamp.today().normalize())
+        with self.lock:
+            self.update(ticker, start, end)
+        return self.local.splits(ticker, start, end)
+
+
+# prices are read from local files when PRICE_DATA_PATH is set, otherwise from yahoo finance through the cache
+provider = (
+    LocalProvider(os.environ['PRICE_DATA_PATH']) if os.environ.get('PRICE_DATA_PATH')
+    else CachedProvider(YahooProvider())
+)
@@ -0,0 +1,55 @@
+'''
+In memory progress messages of background jobs, read by the app's status callback
+'''
+
+from collections import OrderedDict
+import threading
+import time
+
+
+class ProgressRegistry():
+    '''latest progress message of each job, updates arriving faster than min_interval are dropped
+
+    min_interval - minimum number of seconds between two updates of a job
+    max_jobs - number of jobs remembered, the least recently updated are forgotten first
+    '''
+    def __init__(self, min_interval=0.25, max_jobs=256):
+        self.min_interval = min_interval
+        self.max_jobs = max_jobs
+        self.messages = OrderedDict()
+        self.lock = threading.Lock()
+
+    def update(self, job_id, text, force=False):
+        '''set the job's progress message, None clears it
+
+        force - update even if the last update was less than min_interval ago, used for stage changes
+        returns whether the message was updated
+        '''
+        now = time.monotonic()
+        with self.lock:
+            last = self.messages.get(job_id)
+            if not force and last is not None and now - last[1] < self.min_interval:
+                return False
+            self.messages[job_id] = (text, now)
+            self.messages.move_to_end(job_id)
+            while len(self.messages) > self.max_jobs:
+                self.messages.popitem(last=False)
+        return True
+
+    def get(self, job_id):
+        '''latest progress message of the job, None if there is none'''
+        with self.lock:
+            message = self.messages.get(job_id)
+        return None if message is None else message[0]
+
+    def reporter(self, job_id, check=None):
+        '''function reporting throttled progress messages for the job, passed to long running loops
+
+        check - function called before every message, even throttled ones, e.g. Job.check so cancelled jobs
+                stop at their next message
+        '''
+        def report(text):
+            if check is not None:
+                check()
+            self.update(job_id, text)
+        return report
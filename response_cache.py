@@ -0,0 +1,96 @@
+'''
+Compressed on-disk cache of raw SEC edgar responses
+'''
+
+from pathlib import Path
+import hashlib
+import os
+import threading
+import zlib
+
+
+class ResponseCache():
+    '''cache of response bodies keyed by url, bounded in size by evicting the least recently used
+
+    path - directory holding the compressed responses
+    max_size - maximum size of the cache in bytes
+    '''
+    def __init__(self, path=Path('saved_transactions/cache'), max_size=2 * 1024 ** 3):
+        self.path = Path(path)
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.size = None
+
+    def key(self, url):
+        '''sha256 of the url, used as the file name'''
+        return hashlib.sha256(url.encode()).hexdigest()
+
+    def file_path(self, url):
+        '''responses are spread over subdirectories by the first characters of their key'''
+        key = self.key(url)
+        return self.path / key[:2] / key
+
+    def files(self):
+        '''all cached response files'''
+        return [path for path in self.path.glob('*/*') if path.suffix != '.tmp']
+
+    def get(self, url):
+        '''cached response body for url, None if not cached'''
+        path = self.file_path(url)
+        try:
+            with open(path, 'rb') as file:
+                content = zlib.decompress(file.read())
+        except (FileNotFoundError, zlib.error):
+            return None
+        # modified time records when the response was last used
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # evicted by another thread or process since it was read
+            pass
+        return content
+
+    def put(self, url, content):
+        '''save response body for url, evicting old responses if the cache is too large'''
+        path = self.file_path(url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        compressed = zlib.compress(content)
+        # write to a temporary file first so readers never see a partial response
+        temp_path = path.with_name(f'{path.name}.{threading.get_ident()}.tmp')
+        with open(temp_path, 'wb') as file:
+            file.write(compressed)
+        with self.lock:
+            previous = path.stat().st_size if path.exists() else 0
+            os.replace(temp_path, path)
+            if self.size is None:
+                self.size = sum(file.stat().st_size for file in self.files())
+            else:
+                self.size += len(compressed) - previous
+            if self.size > self.max_size:
+                self.evict()
+
+    def evict(self):
+        '''remove least recently used responses until the cache is 90% of its maximum size'''
+        files = []
+        for path in self.files():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        self.size = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if self.size <= self.max_size * 0.9:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            self.size -= size
+
+    def clear(self):
+        '''remove every cached response'''
+        with self.lock:
+            for path in self.files():
+                path.unlink()
+            self.size = 0
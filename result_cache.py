@@ -0,0 +1,67 @@
+'''
+Server side cache of app results, the browser only holds the key of its results
+'''
+
+from collections import OrderedDict
+import pickle
+import threading
+import uuid
+
+from response_cache import ResponseCache
+
+
+class ResultCache():
+    '''in memory cache of results bounded to max_items by evicting the least recently used
+
+    spill_path - directory evicted results are saved to, evicted results are lost if None
+    max_spill_size - maximum size of the spilled results in bytes
+    write_through - save every result to spill_path as soon as it is put, so processes sharing spill_path
+                    can read each other's results
+    '''
+    def __init__(self, max_items=32, spill_path=None, max_spill_size=1024 ** 3, write_through=False):
+        self.max_items = max_items
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.spill = None if spill_path is None else ResponseCache(spill_path, max_spill_size)
+        self.write_through = write_through and self.spill is not None
+
+    def remember(self, key, value):
+        '''keep value in memory, returns the (key, value) pairs evicted to make room for it'''
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            evicted = []
+            while len(self.items) > self.max_items:
+                evicted.append(self.items.popitem(last=False))
+        return evicted
+
+    def save(self, key, value):
+        self.spill.put(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def put(self, value, key=None):
+        '''save value, returns the key it is saved under (a new random key unless key is given)'''
+        key = uuid.uuid4().hex if key is None else key
+        evicted = self.remember(key, value)
+        if self.write_through:
+            self.save(key, value)
+        elif self.spill is not None:
+            for evicted_key, evicted_value in evicted:
+                self.save(evicted_key, evicted_value)
+        return key
+
+    def get(self, key):
+        '''value saved under key, raises KeyError if it has been evicted and not spilled'''
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                return self.items[key]
+        content = None if self.spill is None or key is None else self.spill.get(key)
+        if content is None:
+            raise KeyError(f"No result saved under {key}, submit the request again")
+        # spilled results are moved back into memory
+        value = pickle.loads(content)
+        for evicted_key, evicted_value in self.remember(key, value):
+            if not self.write_through:
+                self.save(evicted_key, evicted_value)
+        return value
+
@@ -1,7 +1,12 @@
 from pathlib import Path
 import os.path
+import re
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 
 
 from bs4 import BeautifulSoup
@@ -9,9 +14,215 @@ import pandas as pd
 import numpy as np
 from tqdm import tqdm
 
+try:
+    import fcntl
+except ImportError:
+    # not available on windows, where the rate limit is only shared between threads of one process
+    fcntl = None
+
+from form4_parser import parse_form4
+from response_cache import ResponseCache
+from transaction_store import TransactionStore
+
+
+class TokenBucket():
+    '''thread-safe token bucket allowing bursts of capacity requests and rate requests per second
+
+    up to capacity + rate requests are made in any one second, a full bucket followed by a second of refill
+
+    path - file holding the bucket, shared by every process using the same file so several app processes
+           stay within one rate limit together, kept per process if not given or on windows
+    '''
+    def __init__(self, rate=9, capacity=1, path=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+        self.path = Path(path) if path is not None and fcntl is not None else None
+
+    def take(self, now):
+        '''refill the bucket up to now and take a token, returns the seconds to wait if none is available'''
+        self.tokens = min(self.capacity, self.tokens + max(now - self.last_refill, 0) * self.rate)
+        self.last_refill = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take_shared(self):
+        '''take a token from the bucket saved in path, locked against other processes while it is updated'''
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a+') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                file.seek(0)
+                state = file.read().split()
+                # wall clock time, monotonic clocks can't be compared between processes
+                now = time.time()
+                self.tokens, self.last_refill = map(float, state) if len(state) == 2 else (self.capacity, now)
+                delay = self.take(now)
+                file.truncate(0)
+                file.write(f'{self.tokens!r} {self.last_refill!r}')
+                file.flush()
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+        return delay
+
+    def wait(self):
+        '''block until a token is available and take it'''
+        while True:
+            with self.lock:
+                delay = self.take(time.monotonic()) if self.path is None else self.take_shared()
+            if delay == 0:
+                return
+            time.sleep(delay)
+
+
+class EdgarSession():
+    '''pooled http session used for every SEC edgar request
+
+    keeps connections alive between requests, identifies the app with a User-Agent (set
+    SEC_USER_AGENT to include a contact email), retries 429/5xx responses with exponential
+    backoff and rate limits all requests through a shared token bucket
+
+    cache - ResponseCache saving every response, filing documents never change once
+            published so they are served from the cache instead of being requested again
+    offline - serve every request from the cache and fail on a cache miss, set EDGAR_OFFLINE=1
+              to start offline
+    rate_file - file holding the token bucket, sessions of every process given the same file share
+                one rate limit
+    '''
+    retry_statuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, rate=9, max_retries=5, backoff=0.5, timeout=30, pool_size=10, cache=None, offline=False,
+                 rate_file=None):
+        self.user_agent = os.environ.get(
+            'SEC_USER_AGENT', 'Insider-Trading-Tracker (https://github.com/A-Hassan7/Insider-Trading-Tracker)'
+        )
+        self.session = requests.Session()
+        self.session.headers.update({'User-Agent': self.user_agent, 'Accept-Encoding': 'gzip, deflate'})
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # no bursts, rate + 1 requests at most in any second stays within the SEC's 10 per second
+        self.rate_limiter = TokenBucket(rate=rate, capacity=1, path=rate_file)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = cache
+        self.offline = offline
+        self.lock = threading.Lock()
+        self.reset_timings()
+
+    def reset_timings(self):
+        '''reset request timing counters'''
+        with self.lock:
+            self.timings = {
+                'requests': 0,
+                'cache_hits': 0,
+                'retries': 0,
+                'errors': 0,
+                'total_time': 0.0,
+                'max_time': 0.0,
+            }
+
+    def record(self, elapsed, retry=False, error=False):
+        '''add a request to the timing counters'''
+        with self.lock:
+            self.timings['requests'] += 1
+            self.timings['retries'] += int(retry)
+            self.timings['errors'] += int(error)
+            self.timings['total_time'] += elapsed
+            self.timings['max_time'] = max(self.timings['max_time'], elapsed)
+
+    def summary(self):
+        '''timing counters including the mean request time'''
+        with self.lock:
+            summary = dict(self.timings)
+        summary['mean_time'] = summary['total_time'] / summary['requests'] if summary['requests'] else 0.0
+        return summary
+
+    def cached(self, url):
+        '''response for url from the cache, None if it should be requested'''
+        # search results and index files change as new filings are made so are only replayed offline
+        if self.cache is None or not (self.offline or '/Archives/edgar/data/' in url):
+            return None
+        content = self.cache.get(url)
+        if content is None:
+            if self.offline:
+                raise requests.ConnectionError(f"{url} is not cached and the session is offline")
+            return None
+        with self.lock:
+            self.timings['cache_hits'] += 1
+        response = requests.Response()
+        response._content = content
+        response.status_code = 200
+        response.url = url
+        return response
+
+    def get(self, url, params=None):
+        '''GET request served from the cache when possible'''
+        url = requests.Request('GET', url, params=params).prepare().url
+        response = self.cached(url)
+        if response is not None:
+            return response
+        response = self.request(url)
+        if self.cache is not None and response.status_code == 200:
+            self.cache.put(url, response.content)
+        return response
+
+    def request(self, url):
+        '''request url from the SEC, retrying with exponential backoff on 429 and 5xx responses'''
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                self.record(time.perf_counter() - start, retry=attempt < self.max_retries, error=True)
+                if attempt == self.max_retries:
+                    raise
+            else:
+                retry = response.status_code in self.retry_statuses and attempt < self.max_retries
+                self.record(time.perf_counter() - start, retry=retry, error=response.status_code >= 400)
+                if not retry:
+                    # retries exhausted, fail rather than parsing an error page
+                    if response.status_code in self.retry_statuses:
+                        response.raise_for_status()
+                    return response
+                # honour Retry-After from the SEC if given in seconds
+                retry_after = response.headers.get('Retry-After', '')
+                if retry_after.isdigit():
+                    time.sleep(int(retry_after))
+                    continue
+            time.sleep(self.backoff * 2 ** attempt)
+
+
+# shared by every scraper and worker thread, SEC allows 10 requests per second which the rate file
+# shares between app processes and scripts running at once
+session = EdgarSession(
+    cache=ResponseCache(), offline=os.environ.get('EDGAR_OFFLINE', '') == '1',
+    rate_file=Path('saved_transactions/rate_limit')
+)
+
+
+def submission_xml(submission):
+    '''(filename, content) of the xml document in a complete submission text file, (None, None) if not found'''
+    # each document in the submission lists its filename before the document body
+    match = re.search(rb'<FILENAME>\s*(\S+\.xml)\s.*?<XML>(.*?)</XML>', submission, re.DOTALL | re.IGNORECASE)
+    if match is None:
+        return None, None
+    return match.group(1).decode(), match.group(2).strip()
+
 
 class Form4Scraper():
-    def __init__(self):
+    def __init__(self, workers=4, session=session, progress=None):
+        # number of threads fetching xml files concurrently, 1 fetches serially
+        self.workers = workers
+        self.session = session
+        # function called with progress messages while extracting, e.g. ProgressRegistry.reporter
+        self.progress = progress
         self.search_endpoint = "https://www.sec.gov/cgi-bin/browse-edgar"
         self.archive_endpoint = "https://www.sec.gov/Archives/edgar/data"
         self.saved_transactions_path = Path("saved_transactions/")
@@ -19,9 +230,7 @@ class Form4Scraper():
         # create saved_transactions folder
         if not os.path.exists("saved_transactions"):
             os.mkdir("saved_transactions")
-        # create progress file for dash
-        with open('app_components/progress.txt', 'w+') as file:
-            file.write('None')
+        self.store = TransactionStore(self.saved_transactions_path / "store")
 
     def reset(self):
         '''reset attributes to original state'''
@@ -51,16 +260,18 @@ class Form4Scraper():
             'post_transaction_shares': [],
             'ownership_nature': [],
         }
-        self.xml_links = []
         self.accessions = []
         self.filing_dates = []
         self.existing_data = False
         self.search_complete = False
+        self.reached_saved = False
+        self.saved_accessions = set()
+        self.coverage = []
 
     def get_search_page(self):
         '''get filings on the search page'''
         # get search response for current params
-        self.search_response = requests.get(url=self.search_endpoint, params=self.params_dict)
+        self.search_response = self.session.get(self.search_endpoint, params=self.params_dict)
         print(f"Searching SEC Edgar for {self.ticker} filings | Start: {self.params_dict['start']}")
         print("url: ", self.search_response.url, "\n")
 
@@ -85,10 +296,26 @@ class Form4Scraper():
             self.accessions.append(str(entry.find("accession-number").text.replace("-", "")))
             self.filing_dates.append(datetime.strptime(entry.find("filing-date").text, "%Y-%m-%d"))
 
+    def search_reached_saved(self, to_date):
+        '''check if the latest search page reached a saved accession and every filing from
+        there back to to_date has already been saved'''
+        count = int(self.params_dict['count'])
+        for accession, date in zip(self.accessions[-count:], self.filing_dates[-count:]):
+            if accession not in self.saved_accessions:
+                continue
+            for oldest, newest in self.coverage:
+                if oldest <= to_date + timedelta(days=1) and oldest <= date <= newest:
+                    return True
+        return False
+
     def check_search_complete(self, to_date):
         '''check if accessions from requested periods have been acquired'''
         to_date = to_date + timedelta(days=1)
         while self.filing_dates[-1] > to_date and not self.search_complete:
+            # stop paging once the remaining filings have already been saved
+            if self.search_reached_saved(to_date):
+                self.reached_saved = True
+                break
             # add current count to start in params_dict and extract new accessions, next page
             new_start = int(self.params_dict['start']) + int(self.params_dict['count'])
             self.params_dict['start'] = str(new_start)
@@ -97,6 +324,8 @@ class Form4Scraper():
         # index all accessions up to that date
         if self.filing_dates[-1] < to_date:
             end_index = [i for i, date in enumerate(self.filing_dates) if date <= to_date][0]
+        elif self.reached_saved:
+            end_index = len(self.accessions)
         elif len(self.accessions) == 1:
             end_index = 1
         else:
@@ -108,69 +337,109 @@ class Form4Scraper():
                 f"Last filing found on {self.filing_dates[end_index].date()}. Try extending the search range."
             )
         self.last_accession = self.accessions[-1]
+        if self.reached_saved and self.filing_dates[-1] >= to_date:
+            # the oldest accessions in range were saved by an earlier search
+            self.last_accession = self.store.oldest_accession(self.ticker, to_date)
+        # filing dates in which every filing has been found
+        oldest = to_date + timedelta(days=1) if self.filing_dates[-1] <= to_date else self.filing_dates[len(self.accessions) - 1]
+        self.searched_range = (oldest, self.filing_dates[0])
 
     def find_xml(self, accession):
         '''find xml file in archive directory for given accession'''
         link = f"{self.archive_endpoint}/{self.cik}/{accession}"
-        response = requests.get(link)
+        # json directory listing is smaller and simpler to read than the html listing
+        response = self.session.get(f"{link}/index.json")
+        if response.status_code == 200:
+            for item in response.json()['directory']['item']:
+                if item['name'].endswith('.xml'):
+                    return f"{link}/{item['name']}"
+        response = self.session.get(link)
         soup = BeautifulSoup(response.content, "lxml")
         # getting the xml file link from table in SEC archives
-        table = soup.find("table").find_all('a', href=True)
-        for element in table:
-            element = str(element)
-            if 'xml' in element.split('>')[0]:
-                xml = element.split()[1].split('href=')[1].split('>')[0][1:-1].split("/")[-1]
-                return f"{link}/{xml}"
+        for element in soup.find("table").find_all('a', href=True):
+            if element['href'].endswith('.xml'):
+                return f"{link}/{element['href'].split('/')[-1]}"
+
+    def fetch_submission_xml(self, accession):
+        '''get xml document embedded in the complete submission text file, None if not found'''
+        link = f"{self.archive_endpoint}/{self.cik}/{accession}"
+        dashed = f"{accession[:10]}-{accession[10:12]}-{accession[12:]}"
+        response = self.session.get(f"{link}/{dashed}.txt")
+        if response.status_code != 200:
+            return None
+        return submission_xml(response.content)[1]
+
+    def fetch_xml(self, accession):
+        '''download xml file for given accession in as few requests as possible
+
+        filing documents are cached by the session, so later scrapes of the accession request the same
+        cached urls and can be replayed offline
+        '''
+        # the complete submission contains the xml so a single request is needed
+        try:
+            content = self.fetch_submission_xml(accession)
+        except requests.ConnectionError:
+            # submissions the SEC did not return are not cached, offline the xml is found through the
+            # cached archive directory instead
+            if not self.session.offline:
+                raise
+            content = None
+        if content is not None:
+            return content
+        # fall back to finding the xml file in the archive directory
+        return self.session.get(self.find_xml(accession)).content
+
+    def parse_xml(self, accession, content):
+        '''extract relevent data from xml file, returns rows keyed like transaction_information'''
+        return self.form4_rows(accession, parse_form4(content))
+
+    def form4_rows(self, accession, form4):
+        '''rows keyed like transaction_information from a parsed Form4'''
+        rows = {key: [] for key in self.transaction_information}
+        # if no non derivitive transactions then append accession, report_period and fill rest with Nan
+        if len(form4.transactions) == 0:
+            rows['accession'].append(accession)
+            rows['report_period'].append(form4.report_period)
+            [rows[f"{key}"].append(np.nan) for key in list(rows.keys())[2:]]
+
+        # non derivitive transactions, header fields are shared by every transaction
+        header = {tag: getattr(form4, tag) for tag in ['name', 'isDirector', 'isOfficer', 'isTenPercentOwner', 'officerTitle']}
+        for transaction in form4.transactions:
+            rows['accession'].append(accession)
+            rows['report_period'].append(form4.report_period)
+            for key, value in header.items():
+                rows[key].append(value)
+            for key, value in transaction._asdict().items():
+                rows[key].append(value)
+        return rows
 
     def extract_from_xml(self):
         '''extract relevent data from xml file for each accession entry'''
         print(f"Extracting data from {len(self.accessions)} files...\n")
-        for i, accession in enumerate(tqdm(self.accessions, desc='Extracting Data')):
-            # output progress to progress.txt for dash
-            with open('app_components/progress.txt', 'w') as file:
-                progress = int(i/len(self.accessions)*100) if i < len(self.accessions)-1 else None
-                file.write(f'Extracting Data... {progress}%')
-                file.close()
-
-            link = self.find_xml(accession)
-            response = requests.get(url=link)
-            soup = BeautifulSoup(response.content, 'xml')
-            # if no non derivitive transactions then append accession, report_period and fill rest with Nan
-            if len(soup.find_all('nonDerivativeTransaction')) == 0:
-                self.transaction_information['accession'].append(accession)
-                self.transaction_information['report_period'].append(datetime.strptime(soup.find('periodOfReport').text[:10], '%Y-%m-%d'))
-                [self.transaction_information[f"{key}"].append(np.nan) for key in list(self.transaction_information.keys())[2:]]
-
-            # non derivitive transactions
-            for transaction in soup.find_all('nonDerivativeTransaction'):
-                self.transaction_information['accession'].append(accession)
-                self.transaction_information['report_period'].append(datetime.strptime(soup.find('periodOfReport').text[:10], '%Y-%m-%d'))
-                self.transaction_information['transaction_period'].append(datetime.strptime(transaction.find('transactionDate').value.text[:10], '%Y-%m-%d'))
-                self.transaction_information['name'].append(soup.find('rptOwnerName').text)
-                self.transaction_information['security'].append(transaction.find('securityTitle').value.text)
-                self.transaction_information['code'].append(transaction.find('transactionCode').text)
-                self.transaction_information['post_transaction_shares'].append(float(transaction.find('sharesOwnedFollowingTransaction').value.text))
-                self.transaction_information['ownership_nature'].append(transaction.find('directOrIndirectOwnership').value.text)
-                # if tag not found, append 0
-                for tag in ['isDirector', 'isOfficer', 'isTenPercentOwner', 'officerTitle']:
-                    if soup.find(tag) != None:
-                        self.transaction_information[f'{tag}'].append(soup.find(tag).text)
-                    else:
-                        self.transaction_information[f'{tag}'].append(0)
-                # if price per share not available, append footnote
-                try:
-                    self.transaction_information['price'].append(float(transaction.find('transactionPricePerShare').value.text))
-                except:
-                    # self.transaction_information['price'].append(transaction.find('transactionPricePerShare').find('footnoteId').get('id'))
-                    self.transaction_information['price'].append(np.nan)
-                # if securities desposed append negitive amount
-                if transaction.find('transactionAcquiredDisposedCode').value.text == "D":
-                    self.transaction_information['shares'].append(-float(transaction.find('transactionShares').value.text))
-                else:
-                    self.transaction_information['shares'].append(float(transaction.find('transactionShares').value.text))
-
-    def form4_data(self, ticker='AAPL', from_date='', to_date=''):
-        '''get form 4 data from sec edgar'''
+        with ThreadPoolExecutor(max_workers=max(self.workers, 1)) as executor:
+            # xml files are read in accession order regardless of which download finishes first
+            futures = [executor.submit(self.fetch_xml, accession) for accession in self.accessions]
+            try:
+                for i, (accession, future) in enumerate(tqdm(zip(self.accessions, futures),
+                                                             total=len(self.accessions), desc='Extracting Data')):
+                    # report progress for dash, raises JobCancelled if the app's job has been cancelled
+                    if self.progress is not None:
+                        self.progress(f'Extracting Data... {int(i / len(self.accessions) * 100)}%')
+
+                    rows = self.parse_xml(accession, future.result())
+                    for key, values in rows.items():
+                        self.transaction_information[key].extend(values)
+            except BaseException:
+                # downloads that have not started are dropped, only those already running are waited for
+                for future in futures:
+                    future.cancel()
+                raise
+
+    def form4_data(self, ticker='AAPL', from_date='', to_date='', incremental=True):
+        '''get form 4 data from sec edgar
+
+        incremental - stop searching once filings that have already been saved are reached
+        '''
         # TODO: handle invalid from_date format
         self.ticker = ticker.upper()
         self.reset()
@@ -178,44 +447,42 @@ class Form4Scraper():
         to_date = datetime.strptime(to_date, "%Y-%m-%d")
         self.params_dict['ticker'] = self.ticker
         self.params_dict['dateb'] = from_date.strftime("%Y%m%d") if from_date != "" else from_date
-        self.get_accessions()
-        self.check_search_complete(to_date)
-
-       
-        data_path = self.saved_transactions_path / f"{self.ticker}.pkl"
-        # check if data for current ticker exists and remove accessions that already exist
-        if os.path.exists(data_path):
-            print(f"Found saved data for {self.ticker}...\n")
-            self.existing_data = True
-            saved_data = pd.read_pickle(data_path)
-            duplicates = []
-            for accession in self.accessions:
-                if accession in saved_data.accession.unique():
-                    duplicates.append(accession)
-            [self.accessions.remove(accession) for accession in duplicates]
-
-        # extract data for each accession and update saved data if required
-        if len(self.accessions) > 0:
-            self.extract_from_xml()
-            # if saved file exists then update file
-            if self.existing_data:
-                print("\nUpdating existing file...\n")
+
+        # another scraper saving the same ticker would save the accessions this one is about to save
+        with self.store.lock(self.ticker):
+            # move transactions saved by earlier versions into the store
+            pickle_path = self.saved_transactions_path / f"{self.ticker}.pkl"
+            if not self.store.exists(self.ticker) and os.path.exists(pickle_path):
+                self.store.write(self.ticker, pd.read_pickle(pickle_path))
+
+            # accessions that have already been saved
+            if self.store.exists(self.ticker):
+                print(f"Found saved data for {self.ticker}...\n")
+                self.existing_data = True
+                self.saved_accessions = self.store.accessions(self.ticker)
+                self.coverage = self.store.coverage(self.ticker) if incremental else []
+
+            self.get_accessions()
+            self.check_search_complete(to_date)
+
+            # remove accessions that have already been saved
+            filing_dates = dict(zip(self.accessions, self.filing_dates))
+            self.accessions = [accession for accession in self.accessions if accession not in self.saved_accessions]
+
+            # extract data for each new accession and append it to the saved data
+            if len(self.accessions) > 0:
+                self.extract_from_xml()
+                if self.existing_data:
+                    print("\nUpdating existing file...\n")
                 update = pd.DataFrame(self.transaction_information)
-                transactions = pd.concat([saved_data, update])
-            else:
-                transactions = pd.DataFrame(self.transaction_information)
-            # sorting and saving transactions
-            transactions.report_period = pd.to_datetime(transactions.report_period)
-            transactions.transaction_period = pd.to_datetime(transactions.transaction_period)
-            transactions.sort_values('report_period', ascending=False, inplace=True)
-            transactions.reset_index(drop=True, inplace=True)
-            transactions.to_pickle(data_path)
+                update.report_period = pd.to_datetime(update.report_period)
+                update.transaction_period = pd.to_datetime(update.transaction_period)
+                self.store.append(self.ticker, update, filing_dates)
+            # record filing dates of saved accessions and the range searched
+            self.store.index(self.ticker, filing_dates, filing_dates)
+            self.store.add_coverage(self.ticker, *self.searched_range)
+
             # return number of files requested, finding the index value of the last accession number
-            start_index = transactions[transactions.report_period <= from_date].index[0] if from_date != "" else 0
-            end_index = transactions[transactions.accession == self.last_accession].index[-1] + 1
-            data = transactions.iloc[start_index:end_index]
-            return data
-        # return number of files requested, finding the index value of the last accession number
-        start_index = saved_data[saved_data.report_period <= from_date].index[0] if from_date != "" else 0
-        end_index = saved_data[saved_data.accession == self.last_accession].index[-1] + 1
-        return saved_data.iloc[start_index:end_index]
+            transactions = self.store.read(self.ticker, end=from_date if from_date != "" else None)
+        end_index = transactions[transactions.accession == self.last_accession].index[-1] + 1
+        return transactions.iloc[:end_index]
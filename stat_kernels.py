@@ -0,0 +1,214 @@
+'''
+Vectorised kernels used to calculate insider and transaction statistics
+'''
+
+from dateutil.relativedelta import relativedelta
+import numpy as np
+import pandas as pd
+
+from trading_calendar import TradingCalendar
+
+
+# periods over which volatility and returns are calculated, labels are used in column names
+horizons = {
+    '1w': relativedelta(weeks=1),
+    '1m': relativedelta(months=1),
+    '3m': relativedelta(months=3),
+    '6m': relativedelta(months=6),
+    '1y': relativedelta(years=1),
+}
+
+
+def to_offset(period):
+    '''convert a relativedelta to a pandas DateOffset so it can be added to every date at once'''
+    if isinstance(period, relativedelta):
+        fields = ['years', 'months', 'days', 'hours', 'minutes', 'seconds']
+        return pd.DateOffset(**{field: getattr(period, field) for field in fields if getattr(period, field)})
+    return period
+
+
+def nearest_positions(index, dates):
+    '''positions of the dates in a sorted index nearest to dates, ties go to the later date'''
+    dates = pd.DatetimeIndex(dates)
+    after = np.clip(index.searchsorted(dates, side='left'), 0, len(index) - 1)
+    before = np.clip(after - 1, 0, len(index) - 1)
+    use_before = (dates - index[before]) < (index[after] - dates)
+    return np.where(use_before, before, after)
+
+
+def exact_positions(index, dates):
+    '''positions of dates in a sorted index, -1 where a date is not in the index'''
+    dates = pd.DatetimeIndex(dates)
+    positions = np.clip(index.searchsorted(dates, side='left'), 0, len(index) - 1)
+    return np.where(index[positions] == dates, positions, -1)
+
+
+def commonstock_transactions(transactions):
+    '''purchases and sales of transactions made on trading days, with amount, pre_transaction_shares and
+    ownership_percentage columns added
+
+    transactions occuring on weekends or exchange holidays do not represent an open market transaction
+    '''
+    calendar = TradingCalendar.covering(transactions.transaction_period)
+    transactions = transactions[calendar.is_trading_day(transactions.transaction_period)]
+    commonstock = transactions.loc[
+        (transactions.code == 'P') | (transactions.code == 'S') & transactions.price != 0
+    ].copy()
+    commonstock = commonstock[commonstock.price.map(type) != str]
+    commonstock.reset_index(inplace=True, drop=True)
+    # the store keeps float32 columns where they are exact, statistics are accumulated in double precision
+    for column in ['shares', 'price', 'post_transaction_shares']:
+        commonstock[column] = commonstock[column].astype(float)
+
+    shares = commonstock.shares
+    commonstock['amount'] = shares * commonstock.price
+    commonstock['pre_transaction_shares'] = commonstock.post_transaction_shares - shares
+    commonstock['ownership_percentage'] = shares / commonstock.pre_transaction_shares * 100
+    return commonstock
+
+
+def split_factors(dates, split_data):
+    '''cumulative split factor for each date, the product of the values of every split after the date
+
+    split_data - split values (e.g. 0.25 for a 4 for 1 split) indexed by split date
+    '''
+    splits = split_data.value.sort_index()
+    # factor after the last split is 1, before it the product of all later splits
+    factors = np.append(np.cumprod(splits.values[::-1].astype(float))[::-1], 1.0)
+    return factors[splits.index.searchsorted(pd.DatetimeIndex(dates), side='right')]
+
+
+def split_adjust(transactions, split_data):
+    '''split adjusted price, shares and post transaction shares of transactions'''
+    factors = split_factors(transactions.transaction_period, split_data)
+    return pd.DataFrame({
+        'adj_price': transactions.price.values * factors,
+        'adj_shares': transactions.shares.values / factors,
+        'adj_post_transaction_shares': transactions.post_transaction_shares.values / factors,
+    }, index=transactions.index)
+
+
+def open_market_mask(transactions, price_data, price_column='adj_price'):
+    '''boolean mask of transactions priced within the low and high of their day's price bar
+
+    transactions without a price bar on their transaction date are not open market transactions
+    '''
+    price_data = price_data.sort_index()
+    positions = exact_positions(price_data.index, transactions.transaction_period)
+    found = positions >= 0
+    high = np.where(found, price_data.High.values[positions], np.nan)
+    low = np.where(found, price_data.Low.values[positions], np.nan)
+    price = transactions[price_column].values
+    return pd.Series(found & (price <= high) & (price >= low), index=transactions.index)
+
+
+def forward_returns(dates, prices, periods=horizons):
+    '''percentage return from the close on each date to the close nearest the end of each period
+
+    dates - transaction dates
+    prices - close prices indexed by date
+    periods - dictionary of label: relativedelta or DateOffset
+
+    returns dataframe with a return_<label> column for each period, NaN where there is no close on the
+    transaction date or the period ends after the last close
+    '''
+    dates = pd.DatetimeIndex(dates)
+    prices = prices.sort_index()
+    closes = prices.values.astype(float)
+    start = exact_positions(prices.index, dates)
+    start_close = np.where(start >= 0, closes[start], np.nan)
+    returns = {}
+    for label, period in periods.items():
+        end = dates + to_offset(period)
+        end_close = np.where(end <= prices.index[-1], closes[nearest_positions(prices.index, end)], np.nan)
+        returns[f'return_{label}'] = (end_close - start_close) / start_close * 100
+    return pd.DataFrame(returns)
+
+
+def insider_statistics(transactions, keys=('name',)):
+    '''calculate statistics for each insider in one pass over transactions
+
+    keys - columns identifying an insider, their first appearance in transactions sets the output order
+
+    sums are accumulated in a different order to summing each insider's transactions separately, share counts
+    are whole numbers so they match exactly but dollar sums can differ in the last bits, well within 1e-13 of
+    the insider's total_volume_dollar
+
+    returns dataframe of insider (and any other keys), total_volume, total_volume_dollar, position_delta,
+    position_delta_dollar, position_delta_percentage, position_rotation and trade_count
+    '''
+    keys = list(keys)
+    columns = pd.DataFrame({
+        'total_volume': transactions.shares.abs(),
+        'total_volume_dollar': transactions.amount.abs(),
+        'position_delta': transactions.shares,
+        'position_delta_dollar': transactions.amount,
+    })
+    groups = [transactions[key] for key in keys]
+    stats = columns.groupby(groups, sort=False, observed=True).sum()
+    # position changes are relative to the position before each insider's last transaction
+    last = transactions.drop_duplicates(keys, keep='last').set_index(keys).pre_transaction_shares
+    last = last.reindex(stats.index)
+    stats['position_delta_percentage'] = stats.position_delta / last * 100
+    stats['position_rotation'] = stats.total_volume / last * 100
+    stats['trade_count'] = columns.groupby(groups, sort=False, observed=True).size()
+    stats.index.names = ['insider' if key == 'name' else key for key in keys]
+    stats = stats.reset_index()
+    return stats[[
+        *stats.columns[:len(keys)],
+        'total_volume',
+        'total_volume_dollar',
+        'position_delta',
+        'position_delta_dollar',
+        'position_delta_percentage',
+        'position_rotation',
+        'trade_count'
+    ]]
+
+
+def window_volatility(dates, prices, periods=horizons, log_returns=False):
+    '''standard deviation of prices in the period before and after each date
+
+    the pre window runs from date - period to the day before date and the post window from the day after
+    date to date + period, post windows ending after the last price are NaN. every window is answered from
+    prefix sums of the prices and squared prices so no window is sliced out of the series
+
+    dates - unique transaction dates
+    prices - close prices indexed by date
+    periods - dictionary of label: relativedelta or DateOffset
+    log_returns - calculate the standard deviation of daily log returns rather than prices
+
+    returns dataframe indexed by (transaction_date, period) with a std_<label> column for each period
+    '''
+    prices = prices.sort_index()
+    index = prices.index
+    values = np.log(prices).diff().values if log_returns else prices.values.astype(float)
+    valid = ~np.isnan(values)
+    # centering reduces the cancellation error of the sum of squares
+    centred = np.where(valid, values - (values[valid].mean() if valid.any() else 0), 0)
+    count = np.concatenate([[0], np.cumsum(valid)])
+    total = np.concatenate([[0], np.cumsum(centred)])
+    squares = np.concatenate([[0], np.cumsum(centred ** 2)])
+
+    def std(start, end):
+        '''sample standard deviation of the values dated start to end inclusive'''
+        lower = index.searchsorted(start, side='left')
+        upper = index.searchsorted(end, side='right')
+        n = count[upper] - count[lower]
+        s = total[upper] - total[lower]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance = (squares[upper] - squares[lower] - s ** 2 / n) / (n - 1)
+        return np.where(n > 1, np.sqrt(np.clip(variance, 0, None)), np.nan)
+
+    dates = pd.DatetimeIndex(dates)
+    day = pd.DateOffset(days=1)
+    volatility = {}
+    for label, period in periods.items():
+        offset = to_offset(period)
+        pre = std(dates - offset, dates - day)
+        post_end = dates + offset
+        post = np.where(post_end <= index[-1], std(dates + day, post_end), np.nan)
+        # pre and post values of each date are adjacent rows
+        volatility[f'std_{label}'] = np.column_stack([pre, post]).ravel()
+    volatility_index = pd.MultiIndex.from_product([dates, ['pre', 'post']], names=['transaction_date', 'period'])
+    return pd.DataFrame(volatility, index=volatility_index)
@@ -0,0 +1,50 @@
+'''
+Time scraping many tickers at once against the local stand-in EDGAR server
+
+python tests/bench_bulk.py [--tickers N] [--filings N] [--latency SECONDS] [--rate REQUESTS_PER_SECOND]
+'''
+
+from contextlib import redirect_stdout
+from pathlib import Path
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import bulk
+from edgar_server import LocalEdgar
+from response_cache import ResponseCache
+from scraper import EdgarSession, Form4Scraper
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark concurrent multi-ticker scraping')
+    parser.add_argument('--tickers', type=int, default=12, help='number of tickers scraped')
+    parser.add_argument('--filings', type=int, default=20, help='number of filings of each ticker')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds the server delays each response by')
+    parser.add_argument('--rate', type=float, default=1000, help='requests per second allowed, the SEC allows 10')
+    parser.add_argument('--workers', type=int, nargs='*', default=[1, 2, 4, 8], help='numbers of tickers scraped at once')
+    args = parser.parse_args()
+
+    tickers = [f'T{i:03d}' for i in range(args.tickers)]
+    edgar = LocalEdgar(tickers=tickers, filings=args.filings, latency=args.latency)
+    bulk.Form4Scraper = lambda **kwargs: edgar.point(Form4Scraper(**kwargs))
+    to_date = edgar.filings[-1][1].strftime('%Y-%m-%d')
+    try:
+        print(f"{'workers':>8}{'seconds':>10}{'tickers/min':>13}{'failed':>8}")
+        for workers in args.workers:
+            with tempfile.TemporaryDirectory() as path:
+                os.chdir(path)
+                session = EdgarSession(rate=args.rate, cache=ResponseCache(Path(path) / 'cache'))
+                start = time.perf_counter()
+                with redirect_stdout(io.StringIO()):
+                    report = bulk.scrape_many(tickers, '', to_date, workers=workers, session=session)
+                seconds = time.perf_counter() - start
+                os.chdir(Path(__file__).resolve().parent)
+            print(f"{workers:>8}{seconds:>10.2f}{len(tickers) / seconds * 60:>13.1f}{(report.status != 'ok').sum():>8}")
+    finally:
+        edgar.close()
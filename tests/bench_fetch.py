@@ -0,0 +1,54 @@
+'''
+Time scraping one ticker against the local stand-in EDGAR server with different numbers of fetch workers
+
+python tests/bench_fetch.py [--filings N] [--latency SECONDS] [--rate REQUESTS_PER_SECOND]
+'''
+
+from pathlib import Path
+from contextlib import redirect_stdout
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from edgar_server import LocalEdgar
+from response_cache import ResponseCache
+from scraper import EdgarSession, Form4Scraper
+
+
+def scrape(edgar, workers, rate):
+    '''seconds taken to scrape every filing from an empty store and cache'''
+    with tempfile.TemporaryDirectory() as path:
+        os.chdir(path)
+        session = EdgarSession(rate=rate, cache=ResponseCache(Path(path) / 'cache'))
+        scraper = edgar.point(Form4Scraper(workers=workers, session=session))
+        start = time.perf_counter()
+        # the scraper reports each search page
+        with redirect_stdout(io.StringIO()):
+            scraper.form4_data(edgar.ticker, '', edgar.filings[-1][1].strftime('%Y-%m-%d'))
+        seconds = time.perf_counter() - start
+        os.chdir(Path(__file__).resolve().parent)
+    return seconds, session.summary()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark concurrent form 4 fetching')
+    parser.add_argument('--filings', type=int, default=100, help='number of filings scraped')
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds the server delays each response by')
+    parser.add_argument('--rate', type=float, default=1000, help='requests per second allowed, the SEC allows 10')
+    parser.add_argument('--workers', type=int, nargs='*', default=[1, 2, 4, 8], help='numbers of fetch workers timed')
+    args = parser.parse_args()
+
+    edgar = LocalEdgar(filings=args.filings, latency=args.latency)
+    try:
+        print(f"{'workers':>8}{'seconds':>10}{'filings/s':>11}{'requests':>10}{'mean ms':>9}")
+        for workers in args.workers:
+            seconds, summary = scrape(edgar, workers, args.rate)
+            print(f"{workers:>8}{seconds:>10.2f}{args.filings / seconds:>11.1f}{summary['requests']:>10}"
+                  f"{summary['mean_time'] * 1000:>9.1f}")
+    finally:
+        edgar.close()
@@ -0,0 +1,36 @@
+'''
+Time the insider statistics kernel against the per-insider reference loop on synthetic transactions
+
+the reference filters every transaction once per insider, it is timed on the first --reference-insiders
+insiders and scaled up to all of them
+
+python tests/bench_insider_stats.py [--rows N] [--insiders N] [--number N] [--reference-insiders N]
+'''
+
+from pathlib import Path
+import argparse
+import sys
+import timeit
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from stat_kernels import insider_statistics
+from test_stat_kernels import reference_insider_statistics, synthetic_transactions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark insider statistics')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='number of transactions')
+    parser.add_argument('--insiders', type=int, default=10_000, help='number of insiders trading')
+    parser.add_argument('--number', type=int, default=5, help='number of times the kernel is run')
+    parser.add_argument('--reference-insiders', type=int, default=100, help='number of insiders the reference is timed on')
+    args = parser.parse_args()
+
+    transactions = synthetic_transactions(args.rows, args.insiders)
+    insiders = transactions.name.unique()
+    sample = min(args.reference_insiders, len(insiders))
+    reference = timeit.timeit(lambda: reference_insider_statistics(transactions, insiders[:sample]), number=1)
+    reference = reference * len(insiders) / sample
+    kernel = timeit.timeit(lambda: insider_statistics(transactions), number=args.number) / args.number
+    print(f"{'rows':>10}{'insiders':>10}{'reference s':>13}{'kernel s':>10}{'speedup':>10}")
+    print(f"{args.rows:>10}{len(insiders):>10}{reference:>13.2f}{kernel:>10.3f}{reference / kernel:>9.0f}x")
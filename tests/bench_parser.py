@@ -0,0 +1,32 @@
+'''
+Time parsing the recorded form 4 documents with lxml against the BeautifulSoup reference
+
+python tests/bench_parser.py [--number N]
+'''
+
+from pathlib import Path
+import argparse
+import sys
+import timeit
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from scraper import Form4Scraper
+from test_form4_parser import bs4_rows, form4_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark form 4 parsing')
+    parser.add_argument('--number', type=int, default=200, help='number of times each document is parsed')
+    args = parser.parse_args()
+
+    scraper = Form4Scraper()
+    documents = {path.stem: path.read_bytes() for path in sorted(form4_path.glob('*.xml'))}
+    print(f"{'document':<28}{'bs4 ms':>10}{'lxml ms':>10}{'speedup':>10}")
+    totals = [0.0, 0.0]
+    for name, content in documents.items():
+        reference = timeit.timeit(lambda: bs4_rows(scraper.transaction_information, name, content), number=args.number)
+        parsed = timeit.timeit(lambda: scraper.parse_xml(name, content), number=args.number)
+        totals = [totals[0] + reference, totals[1] + parsed]
+        print(f"{name:<28}{reference / args.number * 1000:>10.3f}{parsed / args.number * 1000:>10.3f}{reference / parsed:>9.1f}x")
+    print(f"{'total':<28}{totals[0] / args.number * 1000:>10.3f}{totals[1] / args.number * 1000:>10.3f}{totals[0] / totals[1]:>9.1f}x")
@@ -0,0 +1,52 @@
+'''
+Shared fixtures, tests import the app's modules from the repository root
+'''
+
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+fixtures_path = Path(__file__).resolve().parent / 'fixtures'
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    '''run in an empty directory, the scrapers save to saved_transactions/ relative to it'''
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture(params=sorted((fixtures_path / 'form4').glob('*.xml')), ids=lambda path: path.stem)
+def form4_xml(request):
+    '''content of each recorded form 4 document'''
+    return request.param.read_bytes()
+
+
+@pytest.fixture
+def edgar():
+    '''local stand-in for the SEC EDGAR endpoints'''
+    from edgar_server import LocalEdgar
+    server = LocalEdgar()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def edgar_session(workdir):
+    '''session caching responses in the working directory, without the SEC's rate limit'''
+    from response_cache import ResponseCache
+    from scraper import EdgarSession
+    return EdgarSession(rate=1000, backoff=0, cache=ResponseCache(workdir / 'cache'))
+
+
+@pytest.fixture
+def make_scraper(edgar, edgar_session):
+    '''function creating Form4Scrapers requesting the local stand-in'''
+    from scraper import Form4Scraper
+
+    def make_scraper(workers=4, session=edgar_session, **kwargs):
+        return edgar.point(Form4Scraper(workers=workers, session=session, **kwargs))
+    return make_scraper
@@ -0,0 +1,195 @@
+'''
+Local stand-in for the SEC EDGAR endpoints used by the scrapers, serving generated form 4 filings over http
+'''
+
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import json
+import re
+import threading
+import time
+
+
+def form4_xml(i, date, cik):
+    '''form 4 document of the i-th filing of an issuer, alternating open market purchases and sales'''
+    date = date.strftime('%Y-%m-%d')
+    code, disposed = ('P', 'A') if i % 2 else ('S', 'D')
+    return f'''<?xml version="1.0"?>
+<ownershipDocument>
+    <documentType>4</documentType>
+    <periodOfReport>{date}</periodOfReport>
+    <issuer>
+        <issuerCik>{int(cik):010d}</issuerCik>
+    </issuer>
+    <reportingOwner>
+        <reportingOwnerId>
+            <rptOwnerName>Insider {i % 7}</rptOwnerName>
+        </reportingOwnerId>
+        <reportingOwnerRelationship>
+            <isDirector>1</isDirector>
+        </reportingOwnerRelationship>
+    </reportingOwner>
+    <nonDerivativeTable>
+        <nonDerivativeTransaction>
+            <securityTitle><value>Common Stock</value></securityTitle>
+            <transactionDate><value>{date}</value></transactionDate>
+            <transactionCoding><transactionCode>{code}</transactionCode></transactionCoding>
+            <transactionAmounts>
+                <transactionShares><value>{100 + i}</value></transactionShares>
+                <transactionPricePerShare><value>{100 + i % 30}.5</value></transactionPricePerShare>
+                <transactionAcquiredDisposedCode><value>{disposed}</value></transactionAcquiredDisposedCode>
+            </transactionAmounts>
+            <postTransactionAmounts>
+                <sharesOwnedFollowingTransaction><value>100000</value></sharesOwnedFollowingTransaction>
+            </postTransactionAmounts>
+            <ownershipNature>
+                <directOrIndirectOwnership><value>D</value></directOrIndirectOwnership>
+            </ownershipNature>
+        </nonDerivativeTransaction>
+    </nonDerivativeTable>
+</ownershipDocument>
+'''.encode()
+
+
+class LocalEdgar():
+    '''http server in a background thread serving the form 4 filings of a few companies
+
+    tickers - companies served, the first is the default ticker and cik
+    filings - number of filings of each company, one every 3 days back from 2020-09-30
+    latency - seconds every response is delayed by, to time concurrent fetching
+    submissions - serve complete submission text files, if False the scraper has to list the archive directory
+    '''
+    latest = datetime(2020, 9, 30)
+
+    def __init__(self, tickers=('XYZ',), filings=40, latency=0.0, submissions=True):
+        self.ciks = {ticker: str(1234 + i) for i, ticker in enumerate(tickers)}
+        self.ticker, self.cik = tickers[0], self.ciks[tickers[0]]
+        dates = [self.latest - timedelta(days=3 * i) for i in range(filings)]
+        self.company_filings = {
+            cik: [(f'{int(cik):010d}20{500 - i:06d}', date) for i, date in enumerate(dates)] for cik in self.ciks.values()
+        }
+        self.filings = self.company_filings[self.cik]
+        # cik and position of each accession among its company's filings
+        self.positions = {
+            accession: (cik, i) for cik, filings in self.company_filings.items() for i, (accession, _) in enumerate(filings)
+        }
+        self.latency = latency
+        self.submissions = submissions
+        self.requests = []
+        self.lock = threading.Lock()
+        edgar = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                edgar.respond(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def point(self, scraper):
+        '''send a Form4Scraper's or MasterIndexLoader's requests to the server, returns it'''
+        scraper.search_endpoint = f'{self.url}/cgi-bin/browse-edgar'
+        scraper.archive_endpoint = f'{self.url}/Archives/edgar/data'
+        scraper.index_endpoint = f'{self.url}/Archives/edgar'
+        return scraper
+
+    def requested(self, pattern):
+        '''number of requests whose path matches the regular expression'''
+        with self.lock:
+            return sum(re.search(pattern, path) is not None for path in self.requests)
+
+    def respond(self, handler):
+        url = urlparse(handler.path)
+        with self.lock:
+            self.requests.append(url.path)
+        if self.latency:
+            time.sleep(self.latency)
+        status, content = self.route(url.path, {key: values[-1] for key, values in parse_qs(url.query).items()})
+        handler.send_response(status)
+        handler.send_header('Content-Length', str(len(content)))
+        handler.end_headers()
+        handler.wfile.write(content)
+
+    def route(self, path, params):
+        '''(status, content) of the response to a request'''
+        if path == '/cgi-bin/browse-edgar':
+            return 200, self.search(params)
+        match = re.fullmatch(r'/Archives/edgar/full-index/(\d{4})/QTR(\d)/master\.idx', path)
+        if match:
+            return 200, self.master_index(int(match.group(1)), int(match.group(2)))
+        # filings are listed in index files by their submission text file
+        match = re.fullmatch(r'/Archives/edgar/data/(\d+)/(\d{10}-\d{2}-\d{6})\.txt', path)
+        if match and self.positions.get(match.group(2).replace('-', ''), (None,))[0] == match.group(1):
+            return 200, self.submission(match.group(2).replace('-', ''))
+        match = re.fullmatch(r'/Archives/edgar/data/(\d+)/(\d{18})/?(.*)', path)
+        if match is None or self.positions.get(match.group(2), (None,))[0] != match.group(1):
+            return 404, b'Not Found'
+        accession, name = match.group(2), match.group(3)
+        dashed = f'{accession[:10]}-{accession[10:12]}-{accession[12:]}'
+        if name == f'{dashed}.txt' and self.submissions:
+            return 200, self.submission(accession)
+        if name == 'index.json':
+            items = [{'name': f'{dashed}.txt'}, {'name': 'doc4.xml'}]
+            return 200, json.dumps({'directory': {'name': path, 'item': items}}).encode()
+        if name == 'doc4.xml':
+            return 200, self.document(accession)
+        return 404, b'Not Found'
+
+    def search(self, params):
+        '''atom feed of a company's filings, newest first from dateb'''
+        cik = self.ciks.get(params.get('ticker', '').upper())
+        if cik is None:
+            return b'<feed></feed>'
+        dateb = datetime.strptime(params['dateb'], '%Y%m%d') if params.get('dateb') else self.latest
+        filings = [(accession, date) for accession, date in self.company_filings[cik] if date <= dateb]
+        start, count = int(params.get('start', 0)), int(params.get('count', 40))
+        entries = ''.join(
+            f'<entry><content type="text/xml"><accession-number>{accession[:10]}-{accession[10:12]}-{accession[12:]}'
+            f'</accession-number><filing-date>{date:%Y-%m-%d}</filing-date><filing-type>4</filing-type></content></entry>'
+            for accession, date in filings[start:start + count]
+        )
+        return (
+            f'<feed><company-info><cik>{cik}</cik>'
+            f'<conformed-name>COMPANY {cik}</conformed-name></company-info>{entries}</feed>'
+        ).encode()
+
+    def document(self, accession):
+        '''form 4 document of a filing'''
+        cik, i = self.positions[accession]
+        return form4_xml(i, self.company_filings[cik][i][1], cik)
+
+    def submission(self, accession):
+        '''complete submission text file of a filing'''
+        cik, i = self.positions[accession]
+        date = self.company_filings[cik][i][1]
+        return (
+            f'<SEC-DOCUMENT>{accession}.txt : {date:%Y%m%d}\n<SEC-HEADER>\nCONFORMED SUBMISSION TYPE:\t4\n'
+            f'</SEC-HEADER>\n<DOCUMENT>\n<TYPE>4\n<SEQUENCE>1\n<FILENAME>doc4.xml\n<TEXT>\n<XML>\n'
+        ).encode() + self.document(accession) + b'</XML>\n</TEXT>\n</DOCUMENT>\n</SEC-DOCUMENT>\n'
+
+    def master_index(self, year, quarter):
+        '''quarterly master.idx listing every filing under the issuer and a reporting owner'''
+        lines = [
+            'Description:           Master Index of EDGAR Dissemination Feed',
+            '',
+            'CIK|Company Name|Form Type|Date Filed|Filename',
+            '-' * 80,
+        ]
+        for accession, (cik, i) in self.positions.items():
+            date = self.company_filings[cik][i][1]
+            if (date.year, (date.month - 1) // 3 + 1) != (year, quarter):
+                continue
+            filename = f'{accession[:10]}-{accession[10:12]}-{accession[12:]}.txt'
+            lines.append(f'{cik}|COMPANY {cik}|4|{date:%Y-%m-%d}|edgar/data/{cik}/{filename}')
+            lines.append(f'99999|DOE JOHN|4|{date:%Y-%m-%d}|edgar/data/99999/{filename}')
+        return ('\n'.join(lines) + '\n').encode()
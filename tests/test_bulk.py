@@ -0,0 +1,20 @@
+import bulk
+from edgar_server import LocalEdgar
+from scraper import Form4Scraper
+from transaction_store import TransactionStore
+
+
+def test_scrape_many_reports_each_ticker(workdir, edgar_session, monkeypatch):
+    edgar = LocalEdgar(tickers=('AAA', 'BBB', 'CCC'), filings=20)
+    monkeypatch.setattr(bulk, 'Form4Scraper', lambda **kwargs: edgar.point(Form4Scraper(**kwargs)))
+    try:
+        report = bulk.scrape_many(['aaa', 'BBB', 'ccc', 'aaa', 'MISSING'], '', '2020-08-01', workers=4,
+                                  fetch_workers=2, session=edgar_session)
+    finally:
+        edgar.close()
+    assert list(report.ticker) == ['AAA', 'BBB', 'CCC', 'MISSING']
+    assert list(report.status) == ['ok', 'ok', 'ok', 'failed']
+    assert report.error.iloc[3].startswith('ValueError')
+    # every ticker is saved separately from the same filings
+    store = TransactionStore(workdir / 'saved_transactions' / 'store')
+    assert [len(store.accessions(ticker)) for ticker in ['AAA', 'BBB', 'CCC']] == [report.transactions.iloc[0]] * 3
@@ -0,0 +1,79 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('dash')
+from app_components.chart_components import ChartComponents  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def components():
+    return ChartComponents()
+
+
+@pytest.fixture
+def insiders():
+    return pd.DataFrame({
+        'insider': ['Cook Timothy D', 'Maestri Luca', 'Adams Katherine L', 'Cook Timothy D', 'Levinson Arthur D'],
+        'code': ['S', 'S', 'P', 'P', 'S'],
+        'shares': [100.0, 250.0, 50.0, 100.0, 75.0],
+        'transaction_period': pd.to_datetime(['2020-08-24', '2020-08-25', '2020-08-25', '2020-09-01', '2020-09-02']),
+    })
+
+
+def page_column(components, dataframe, column, **kwargs):
+    records, _ = components.table_page(dataframe, **kwargs)
+    return [record[column] for record in records]
+
+
+@pytest.mark.parametrize('filter_part, expected', [
+    ('{shares} = 100', ('shares', 'eq', 100.0)),
+    ('{code} != S', ('code', 'ne', 'S')),
+    ('{shares} < 100', ('shares', 'lt', 100.0)),
+    ('{shares} >= 75', ('shares', 'ge', 75.0)),
+    ('{insider} contains cook', ('insider', 'contains', 'cook')),
+    ('{insider} = "Cook Timothy D"', ('insider', 'eq', 'Cook Timothy D')),
+    ("{insider} contains 'Timothy D'", ('insider', 'contains', 'Timothy D')),
+    ('{transaction_period} datestartswith 2020-08', ('transaction_period', 'datestartswith', '2020-08')),
+    ('no operator', (None, None, None)),
+])
+def test_split_filter(components, filter_part, expected):
+    assert components.split_filter(filter_part) == expected
+
+
+@pytest.mark.parametrize('filter_query, expected', [
+    ('{shares} = 100', [0, 3]),
+    ('{code} != S', [2, 3]),
+    ('{shares} < 100', [2, 4]),
+    ('{shares} >= 100', [0, 1, 3]),
+    ('{insider} contains cook', [0, 3]),
+    ('{insider} = "Cook Timothy D"', [0, 3]),
+    ('{insider} contains "Timothy D" && {code} = S', [0]),
+    ('{shares} >= 75 && {code} = S && {transaction_period} datestartswith 2020-08', [0, 1]),
+    # unknown columns and values that can't be compared with the column are ignored
+    ('{missing} = 1 && {shares} > text', [0, 1, 2, 3, 4]),
+])
+def test_table_page_filters(components, insiders, filter_query, expected):
+    insiders['row'] = range(len(insiders))
+    assert page_column(components, insiders, 'row', filter_query=filter_query) == expected
+
+
+def test_table_page_sorts_by_several_columns(components, insiders):
+    sort_by = [{'column_id': 'code', 'direction': 'asc'}, {'column_id': 'shares', 'direction': 'desc'}]
+    records, _ = components.table_page(insiders, sort_by=sort_by)
+    assert [(record['code'], record['shares']) for record in records] == [
+        ('P', 100.0), ('P', 50.0), ('S', 250.0), ('S', 100.0), ('S', 75.0)
+    ]
+    # ties keep their order
+    sort_by = [{'column_id': 'code', 'direction': 'desc'}]
+    assert page_column(components, insiders, 'insider', sort_by=sort_by)[:3] == [
+        'Cook Timothy D', 'Maestri Luca', 'Levinson Arthur D'
+    ]
+
+
+def test_table_page_pages(components, insiders):
+    records, page_count = components.table_page(insiders, page_current=2, page_size=2)
+    # the last page holds the one row left over
+    assert page_count == 3
+    assert records == [{'insider': 'Levinson Arthur D', 'code': 'S', 'shares': 75.0, 'transaction_period': '2020-09-02'}]
+    assert components.table_page(insiders, page_size=5)[1] == 1
+    assert components.table_page(insiders.iloc[:0], page_size=5) == ([], 1)
@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from cross_section import CrossSectionStats
+from transaction_store import TransactionStore, migrate_pickles
+
+# (ticker, insider, transaction date, code, shares, price), 5 September 2020 is a saturday
+trades = [
+    ('AAA', 'Alice', '2020-08-03', 'P', 100.0, 9.0),
+    ('AAA', 'Alice', '2020-09-01', 'P', 100.0, 10.0),
+    ('AAA', 'Bob', '2020-09-02', 'P', 200.0, 11.0),
+    ('AAA', 'Carol', '2020-09-03', 'S', 50.0, 12.0),
+    ('BBB', 'Dan', '2020-09-04', 'P', 1000.0, 5.0),
+    ('BBB', 'Dan', '2020-09-05', 'P', 1000.0, 5.0),
+    ('BBB', 'Erin', '2020-09-08', 'P', 10.0, 5.0),
+    ('BBB', 'Dan', '2020-09-09', 'P', 500.0, 5.0),
+    ('CCC', 'Frank', '2020-09-01', 'P', 300.0, 20.0),
+    ('CCC', 'Frank', '2020-09-02', 'G', 10.0, 0.0),
+]
+
+
+@pytest.fixture
+def stats(workdir):
+    # ticker frames pickled by earlier versions, migrated into the store
+    pickle_path = workdir / 'saved_transactions'
+    pickle_path.mkdir()
+    for ticker, ticker_trades in pd.DataFrame(trades).groupby(0):
+        dates = [datetime.strptime(date, '%Y-%m-%d') for date in ticker_trades[2]]
+        pd.DataFrame({
+            'accession': [f'{ticker}{i}' for i in range(len(ticker_trades))],
+            'report_period': dates,
+            'transaction_period': dates,
+            'name': ticker_trades[1].values,
+            'isDirector': '1',
+            'isOfficer': 0,
+            'isTenPercentOwner': 0,
+            'officerTitle': 0,
+            'security': 'Common Stock',
+            'code': ticker_trades[3].values,
+            'shares': ticker_trades[4].values,
+            'price': ticker_trades[5].values,
+            'post_transaction_shares': 10000.0,
+            'ownership_nature': 'D',
+        }).iloc[::-1].to_pickle(pickle_path / f'{ticker}.pkl')
+    store = TransactionStore(workdir / 'store')
+    assert migrate_pickles(pickle_path, store) == ['AAA', 'BBB', 'CCC']
+    return CrossSectionStats(store=store)
+
+
+def test_load_many_tickers(stats):
+    transactions = stats.load(['aaa', 'BBB', 'AAA', 'CCC', 'MISSING'])
+    # weekend trades and gifts are dropped, tickers missing from the store are skipped
+    assert transactions.groupby('ticker', observed=True).size().to_dict() == {'AAA': 4, 'BBB': 3, 'CCC': 1}
+    # each ticker's categories are merged into one categorical column
+    assert list(transactions.ticker.cat.categories) == ['AAA', 'BBB', 'CCC']
+    assert isinstance(transactions.name.dtype, pd.CategoricalDtype)
+    assert set(transactions.name.cat.categories) == {'Alice', 'Bob', 'Carol', 'Dan', 'Erin', 'Frank'}
+    assert set(transactions.code.cat.categories) == {'P', 'S'}
+    # newest report first within each ticker
+    assert transactions[transactions.ticker == 'AAA'].amount.tolist() == [600.0, 2200.0, 1000.0, 900.0]
+    with pytest.raises(Exception, match='No commonstock transactions'):
+        stats.load(['MISSING'])
+
+
+def test_cluster_buys(stats):
+    stats.load(['AAA', 'BBB', 'CCC'])
+    clusters = stats.cluster_buys(days=30, as_of='2020-09-10')
+    # CCC has a single buyer, AAA's purchase in early August is outside the window
+    assert clusters.ticker.tolist() == ['BBB', 'AAA']
+    assert clusters.insiders.tolist() == [2, 2]
+    assert clusters.trade_count.tolist() == [3, 2]
+    assert clusters.amount.tolist() == [7550.0, 3200.0]
+    assert clusters.first_trade.tolist() == [pd.Timestamp('2020-09-04'), pd.Timestamp('2020-09-01')]
+    assert stats.cluster_buys(days=30, as_of='2020-09-10', min_insiders=1).ticker.tolist() == ['BBB', 'AAA', 'CCC']
+    # only Dan bought in the last two days
+    assert stats.cluster_buys(days=2, as_of='2020-09-10').empty
+
+
+def test_rank_insiders(stats):
+    stats.load(['AAA', 'BBB', 'CCC'])
+    ranked = stats.rank_insiders(top=3)
+    assert ranked[['ticker', 'insider']].values.tolist() == [['BBB', 'Dan'], ['CCC', 'Frank'], ['AAA', 'Bob']]
+    assert ranked.position_delta_dollar.tolist() == [7500.0, 6000.0, 2200.0]
+    assert ranked.trade_count.tolist() == [2, 1, 1]
+    # only the trades from 3 September, smallest first
+    recent = stats.rank_insiders(by='total_volume', days=8, as_of='2020-09-10', ascending=True)
+    assert recent[['ticker', 'insider', 'total_volume']].values.tolist() == [
+        ['BBB', 'Erin', 10.0], ['AAA', 'Carol', 50.0], ['BBB', 'Dan', 1500.0]
+    ]
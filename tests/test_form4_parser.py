@@ -0,0 +1,75 @@
+from datetime import datetime
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+import numpy as np
+import pandas as pd
+import pytest
+
+from form4_parser import parse_form4
+from scraper import Form4Scraper
+
+form4_path = Path(__file__).resolve().parent / 'fixtures' / 'form4'
+
+
+def bs4_rows(columns, accession, content):
+    '''rows extracted the way Form4Scraper did with BeautifulSoup before the lxml parser'''
+    rows = {key: [] for key in columns}
+    soup = BeautifulSoup(content, 'xml')
+    report_period = datetime.strptime(soup.find('periodOfReport').text[:10], '%Y-%m-%d')
+    if len(soup.find_all('nonDerivativeTransaction')) == 0:
+        rows['accession'].append(accession)
+        rows['report_period'].append(report_period)
+        [rows[key].append(np.nan) for key in list(rows.keys())[2:]]
+    for transaction in soup.find_all('nonDerivativeTransaction'):
+        rows['accession'].append(accession)
+        rows['report_period'].append(report_period)
+        rows['transaction_period'].append(datetime.strptime(transaction.find('transactionDate').value.text[:10], '%Y-%m-%d'))
+        rows['name'].append(soup.find('rptOwnerName').text)
+        rows['security'].append(transaction.find('securityTitle').value.text)
+        rows['code'].append(transaction.find('transactionCode').text)
+        rows['post_transaction_shares'].append(float(transaction.find('sharesOwnedFollowingTransaction').value.text))
+        rows['ownership_nature'].append(transaction.find('directOrIndirectOwnership').value.text)
+        for tag in ['isDirector', 'isOfficer', 'isTenPercentOwner', 'officerTitle']:
+            rows[tag].append(soup.find(tag).text if soup.find(tag) is not None else 0)
+        try:
+            rows['price'].append(float(transaction.find('transactionPricePerShare').value.text))
+        except (AttributeError, ValueError):
+            rows['price'].append(np.nan)
+        shares = float(transaction.find('transactionShares').value.text)
+        rows['shares'].append(-shares if transaction.find('transactionAcquiredDisposedCode').value.text == 'D' else shares)
+    return rows
+
+
+def test_parse_xml_matches_beautifulsoup(workdir, form4_xml):
+    scraper = Form4Scraper()
+    rows = scraper.parse_xml('000000123420000001', form4_xml)
+    expected = bs4_rows(scraper.transaction_information, '000000123420000001', form4_xml)
+    pd.testing.assert_frame_equal(pd.DataFrame(rows), pd.DataFrame(expected))
+
+
+def test_parse_form4_reads_every_non_derivative_transaction(form4_xml):
+    form4 = parse_form4(form4_xml)
+    soup = BeautifulSoup(form4_xml, 'xml')
+    assert len(form4.transactions) == len(soup.find_all('nonDerivativeTransaction'))
+
+
+def test_parse_form4_fields():
+    form4 = parse_form4((form4_path / 'multiple_transactions.xml').read_bytes())
+    assert form4.report_period == datetime(2020, 8, 25)
+    assert (form4.name, form4.isDirector, form4.isOfficer, form4.isTenPercentOwner) == ('Cook Timothy D', '1', '1', '0')
+    assert [transaction.code for transaction in form4.transactions] == ['M', 'F', 'S']
+    assert [transaction.shares for transaction in form4.transactions] == [560000, -294840, -132808]
+    # footnoted prices without a value are missing, footnotes next to a value are ignored
+    assert np.isnan(form4.transactions[0].price)
+    assert form4.transactions[2].price == pytest.approx(496.8)
+    assert form4.transactions[2].transaction_period == datetime(2020, 8, 25)
+
+
+def test_parse_form4_missing_relationship_and_timezone_dates():
+    gift = parse_form4((form4_path / 'gift_no_relationship.xml').read_bytes())
+    assert (gift.isDirector, gift.isOfficer, gift.isTenPercentOwner, gift.officerTitle) == (0, 0, 0, 0)
+    assert np.isnan(gift.transactions[0].price)
+    purchase = parse_form4((form4_path / 'purchase_with_timezone.xml').read_bytes())
+    assert purchase.report_period == datetime(2020, 3, 12)
+    assert purchase.transactions[0].transaction_period == datetime(2020, 3, 12)
@@ -0,0 +1,84 @@
+import threading
+
+from jobs import JobQueue
+
+
+def wait_for(queue, job_id):
+    queue.get(job_id).future.result()
+    return queue.get(job_id)
+
+
+def test_on_finish_reports_finished_jobs():
+    finished = []
+    queue = JobQueue(workers=1, on_finish=lambda job: finished.append((job.id, job.status, job.error)))
+    done = queue.submit('done', lambda job: 1)
+    failed = queue.submit('failed', lambda job: 1 / 0)
+    assert wait_for(queue, done).result == 1
+    assert wait_for(queue, failed).status == 'failed'
+    assert finished == [(done, 'done', None), (failed, 'failed', 'ZeroDivisionError: division by zero')]
+
+
+def test_cancelled_queued_job_is_reported():
+    finished = []
+    release = threading.Event()
+    queue = JobQueue(workers=1, on_finish=lambda job: finished.append((job.id, job.status)))
+    running = queue.submit('running', lambda job: release.wait())
+    queued = queue.submit('queued', lambda job: 1)
+    assert queue.cancel(queued)
+    release.set()
+    wait_for(queue, running)
+    assert queue.status(queued) == 'cancelled'
+    assert finished == [(queued, 'cancelled'), (running, 'done')]
+
+
+def test_cancel_waits_for_every_caller():
+    release = threading.Event()
+    queue = JobQueue(workers=1)
+
+    def run(job):
+        release.wait()
+        job.check()
+        return 'result'
+    first = queue.submit(('stats', 'XYZ'), run)
+    second = queue.submit(('stats', 'XYZ'), run)
+    assert first == second
+    # the second request still wants the result
+    assert not queue.cancel(first)
+    assert queue.cancel(second)
+    release.set()
+    assert wait_for(queue, first).status == 'cancelled'
+    # a new request does not join the cancelled job
+    assert queue.submit(('stats', 'XYZ'), run) != first
+
+
+def test_joined_job_finishes_after_one_caller_cancels():
+    release = threading.Event()
+    queue = JobQueue(workers=1)
+
+    def run(job):
+        release.wait()
+        job.check()
+        return 'result'
+    job_id = queue.submit('key', run)
+    queue.submit('key', run)
+    assert not queue.cancel(job_id)
+    release.set()
+    job = wait_for(queue, job_id)
+    assert (job.status, job.result) == ('done', 'result')
+
+
+def test_resubmit_from_same_caller_is_cancelled_once():
+    release = threading.Event()
+    queue = JobQueue(workers=1)
+
+    def run(job):
+        release.wait()
+        job.check()
+        return 'result'
+    job_id = queue.submit('key', run)
+    # the same browser clicking submit again passes the job it is waiting for
+    assert queue.submit('key', run, previous=job_id) == job_id
+    assert queue.get(job_id).callers == 1
+    assert queue.cancel(job_id)
+    release.set()
+    assert wait_for(queue, job_id).status == 'cancelled'
@@ -0,0 +1,103 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from edgar_server import LocalEdgar
+from master_index import MasterIndexLoader
+
+index_path = Path(__file__).resolve().parent / 'fixtures' / 'index'
+
+
+@pytest.fixture
+def loader(workdir, edgar_session):
+    return MasterIndexLoader(index_path / 'company_tickers.json', session=edgar_session)
+
+
+def test_load_ticker_map_keeps_primary_share_class(loader, workdir):
+    assert loader.tickers == {320193: 'AAPL', 789019: 'MSFT', 1652044: 'GOOGL', 1318605: 'TSLA'}
+    (workdir / 'tickers.csv').write_text('cik,ticker\n320193,aapl\n1652044,GOOGL\n1652044,GOOG\n')
+    assert loader.load_ticker_map(workdir / 'tickers.csv') == {320193: 'AAPL', 1652044: 'GOOGL'}
+
+
+def test_read_master_and_form_index_match(loader):
+    master = loader.read_index((index_path / 'master.idx').read_bytes())
+    form = loader.read_index((index_path / 'form.idx').read_bytes())
+    assert list(master.columns) == ['cik', 'company', 'form_type', 'date_filed', 'filename']
+    assert len(master) == 12
+    assert master.iloc[0].to_dict() == {
+        'cik': 1214156,
+        'company': 'Cook Timothy D',
+        'form_type': '4',
+        'date_filed': pd.Timestamp('2020-08-26'),
+        'filename': 'edgar/data/1214156/0001181431-20-013465.txt',
+    }
+    columns = ['cik', 'form_type', 'filename']
+    pd.testing.assert_frame_equal(
+        master.sort_values(columns).reset_index(drop=True), form.sort_values(columns).reset_index(drop=True)
+    )
+
+
+def test_read_daily_index_dates(loader):
+    daily = loader.read_index((index_path / 'master.20200901.idx').read_text())
+    assert list(daily.date_filed.unique()) == [pd.Timestamp('2020-09-01')]
+    assert list(daily.form_type) == ['4', '4', '8-K']
+
+
+def test_select_filings(loader):
+    index = loader.read_index((index_path / 'form.idx').read_bytes())
+    filings = loader.select_filings(index, '2020-07-01', '2020-09-30')
+    # form 4 filings listed under mapped companies only, each accession once even when listed under its reporting owner
+    assert list(filings.tickers) == [('AAPL',), ('AAPL',), ('GOOGL',), ('MSFT',), ('TSLA',)]
+    assert list(filings.accession) == [
+        '000118143120016153', '000118143120013465', '000120919120039532', '000106299320003823', '000120919120048736'
+    ]
+    assert loader.select_filings(index, '2020-07-01', '2020-09-30', form_types=('4', '4/A')).tickers.tolist().count(('GOOGL',)) == 2
+
+
+def test_index_urls(loader):
+    assert loader.index_urls('2020-02-15', '2020-07-01') == [
+        f'{loader.index_endpoint}/full-index/2020/QTR{quarter}/master.idx' for quarter in [1, 2, 3]
+    ]
+    assert loader.index_urls('2020-09-04', '2020-09-08', daily=True) == [
+        f'{loader.index_endpoint}/daily-index/2020/QTR3/master.{date}.idx' for date in ['20200904', '20200907', '20200908']
+    ]
+
+
+def test_load_from_local_edgar(workdir, edgar_session):
+    edgar = LocalEdgar(tickers=('AAA', 'BBB'), filings=30)
+    (workdir / 'tickers.csv').write_text(''.join(f'{cik},{ticker}\n' for ticker, cik in [('ticker', 'cik'), *edgar.ciks.items()]))
+    loader = edgar.point(MasterIndexLoader(workdir / 'tickers.csv', session=edgar_session))
+    try:
+        report = loader.load('2020-08-01', '2020-09-30')
+        # filings already saved are skipped
+        assert loader.load('2020-08-01', '2020-09-30').empty
+    finally:
+        edgar.close()
+    expected = sum(pd.Timestamp('2020-08-01') <= date <= pd.Timestamp('2020-09-30') for _, date in edgar.filings)
+    assert report.to_dict('list') == {'ticker': ['AAA', 'BBB'], 'filings': [expected] * 2, 'transactions': [expected] * 2}
+    assert loader.store.accessions('AAA') == {
+        accession for accession, date in edgar.company_filings[edgar.ciks['AAA']] if date >= pd.Timestamp('2020-08-01')
+    }
+
+
+def test_load_saves_filing_under_issuer(workdir, edgar_session, monkeypatch):
+    # a BAC form 4 filed by Berkshire Hathaway is listed under both companies, Berkshire's row first
+    (workdir / 'tickers.csv').write_text('cik,ticker\n1067983,BRK-B\n70858,BAC\n')
+    (workdir / 'master.idx').write_text('\n'.join([
+        'CIK|Company Name|Form Type|Date Filed|Filename',
+        '-' * 80,
+        '1067983|BERKSHIRE HATHAWAY INC|4|2020-09-01|edgar/data/70858/0001193125-20-236123.txt',
+        '70858|BANK OF AMERICA CORP /DE/|4|2020-09-01|edgar/data/70858/0001193125-20-236123.txt',
+    ]) + '\n')
+    loader = MasterIndexLoader(workdir / 'tickers.csv', session=edgar_session)
+    assert list(loader.select_filings(loader.get_index('2020-09-01', '2020-09-01', [workdir / 'master.idx']),
+                                      '2020-09-01', '2020-09-01').tickers) == [('BAC', 'BRK-B')]
+    document = (Path(__file__).resolve().parent / 'fixtures' / 'form4' / 'purchase_with_timezone.xml').read_bytes()
+    monkeypatch.setattr(loader, 'fetch_filing', lambda filename: document)
+    report = loader.load('2020-09-01', '2020-09-01', index_files=[workdir / 'master.idx'])
+    assert report.ticker.tolist() == ['BAC']
+    assert loader.store.accessions('BAC') == {'000119312520236123'}
+    assert loader.store.accessions('BRK-B') == set()
+    # already saved under the issuer, so it is not fetched again through the owner's listing
+    assert loader.load('2020-09-01', '2020-09-01', index_files=[workdir / 'master.idx']).empty
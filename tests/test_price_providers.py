@@ -0,0 +1,102 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from price_providers import CachedProvider, LocalProvider
+
+
+def write_prices(path, ticker, start='2020-01-01', end='2020-12-31', close=100.0):
+    '''daily bars between start and end saved as <ticker>.csv, with a 2 for 1 split on 2020-06-01'''
+    dates = pd.bdate_range(start, end, name='Date')
+    prices = pd.DataFrame({'Close': close + np.arange(len(dates), dtype=float)}, index=dates)
+    for column in ['High', 'Low', 'Open', 'Adj Close']:
+        prices[column] = prices.Close
+    prices['Volume'] = 1000.0
+    path.mkdir(parents=True, exist_ok=True)
+    prices.to_csv(path / f'{ticker}.csv')
+    splits = pd.DataFrame({'value': [0.5]}, index=pd.DatetimeIndex(['2020-06-01'], name='Date'))
+    splits.to_csv(path / f'{ticker}_splits.csv')
+    return prices
+
+
+class RecordingProvider(LocalProvider):
+    '''local provider recording the ranges requested from it'''
+    def __init__(self, path):
+        super().__init__(path)
+        self.requests = []
+
+    def prices(self, ticker, start=None, end=None):
+        self.requests.append((ticker, pd.Timestamp(start), pd.Timestamp(end)))
+        return super().prices(ticker, start, end)
+
+
+def set_updated(cache, ticker, updated):
+    '''change when the cached ticker was last updated'''
+    path = cache.path / f'{ticker}.json'
+    coverage = json.loads(path.read_text())
+    coverage['updated'] = updated
+    path.write_text(json.dumps(coverage))
+
+
+def test_local_provider(tmp_path):
+    prices = write_prices(tmp_path, 'XYZ')
+    provider = LocalProvider(tmp_path)
+    pd.testing.assert_frame_equal(provider.prices('xyz', '2020-03-02', '2020-03-31'), prices.loc['2020-03-02':'2020-03-31'],
+                                  check_freq=False)
+    assert list(provider.splits('XYZ', '2020-01-01', '2020-12-31').value) == [0.5]
+    assert provider.splits('XYZ', '2020-07-01', '2020-12-31').empty
+    with pytest.raises(FileNotFoundError):
+        provider.prices('MISSING')
+
+
+def test_cached_provider_requests_only_missing_ranges(tmp_path):
+    source = RecordingProvider(tmp_path / 'source')
+    prices = write_prices(source.path, 'XYZ')
+    cache = CachedProvider(source, tmp_path / 'cache')
+    cache.prices('XYZ', '2020-03-01', '2020-03-31')
+    cache.prices('XYZ', '2020-03-10', '2020-03-20')
+    cached = cache.prices('XYZ', '2020-02-01', '2020-04-30')
+    assert source.requests == [
+        ('XYZ', pd.Timestamp('2020-03-01'), pd.Timestamp('2020-03-31')),
+        ('XYZ', pd.Timestamp('2020-02-01'), pd.Timestamp('2020-02-29')),
+        ('XYZ', pd.Timestamp('2020-04-01'), pd.Timestamp('2020-04-30')),
+    ]
+    pd.testing.assert_frame_equal(cached, prices.loc['2020-02-01':'2020-04-30'], check_freq=False)
+    assert list(cache.splits('XYZ', '2020-02-01', '2020-06-30').value) == [0.5]
+
+
+def test_cached_provider_refreshes_bars_saved_before_the_close(tmp_path):
+    source = RecordingProvider(tmp_path / 'source')
+    write_prices(source.path, 'XYZ', close=100.0)
+    cache = CachedProvider(source, tmp_path / 'cache')
+    cache.prices('XYZ', '2020-03-02', '2020-03-31')
+    # saved during 2020-03-31's session, its bar has changed since
+    set_updated(cache, 'XYZ', '2020-03-31 11:00:00-04:00')
+    updated = write_prices(source.path, 'XYZ', close=200.0)
+    source.requests.clear()
+    refreshed = cache.prices('XYZ', '2020-03-02', '2020-03-31')
+    assert source.requests == [('XYZ', pd.Timestamp('2020-03-31'), pd.Timestamp('2020-03-31'))]
+    assert refreshed.Close.iloc[-1] == updated.Close.loc['2020-03-31']
+    # saved after the close, nothing is requested again
+    source.requests.clear()
+    assert cache.prices('XYZ', '2020-03-02', '2020-03-31').Close.iloc[-1] == updated.Close.loc['2020-03-31']
+    assert source.requests == []
+
+
+def test_cached_provider_refreshes_from_the_update_day(tmp_path):
+    source = RecordingProvider(tmp_path / 'source')
+    write_prices(source.path, 'XYZ')
+    cache = CachedProvider(source, tmp_path / 'cache')
+    cache.prices('XYZ', '2020-03-02', '2020-03-31')
+    # a cache updated during 2020-03-30's session, before the end of its range was reached
+    set_updated(cache, 'XYZ', '2020-03-30T10:00:00-04:00')
+    source.requests.clear()
+    cache.prices('XYZ', '2020-03-02', '2020-04-15')
+    assert source.requests == [('XYZ', pd.Timestamp('2020-03-30'), pd.Timestamp('2020-04-15'))]
+    # requests ending before the day the cache was updated use the cached bars
+    set_updated(cache, 'XYZ', '2020-04-15T10:00:00-04:00')
+    source.requests.clear()
+    cache.prices('XYZ', '2020-03-02', '2020-04-10')
+    assert source.requests == []
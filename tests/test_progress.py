@@ -0,0 +1,23 @@
+import pytest
+
+from jobs import Job, JobCancelled
+from progress import ProgressRegistry
+
+
+def test_updates_are_throttled():
+    registry = ProgressRegistry(min_interval=60)
+    assert registry.update('job', 'first')
+    assert not registry.update('job', 'second')
+    assert registry.update('job', 'stage', force=True)
+    assert registry.get('job') == 'stage'
+
+
+def test_reporter_checks_before_throttled_messages():
+    registry = ProgressRegistry(min_interval=60)
+    job = Job('key')
+    report = registry.reporter(job.id, check=job.check)
+    report('Extracting Data... 0%')
+    job.cancel_event.set()
+    with pytest.raises(JobCancelled):
+        report('Extracting Data... 1%')
+    assert registry.get(job.id) == 'Extracting Data... 0%'
@@ -0,0 +1,52 @@
+import multiprocessing
+import time
+
+import pytest
+
+from scraper import EdgarSession, TokenBucket, fcntl
+
+
+def max_in_window(times, window):
+    '''largest number of times falling within window seconds of each other'''
+    return max(sum(start <= other <= start + window for other in times) for start in times)
+
+
+@pytest.mark.parametrize('capacity', [1, 3])
+def test_token_bucket_requests_in_any_window(capacity):
+    # 9 requests per second scaled up ten times to keep the test short
+    bucket = TokenBucket(rate=90, capacity=capacity)
+    times = []
+    for _ in range(40):
+        bucket.wait()
+        times.append(time.monotonic())
+    assert max_in_window(times, 0.1) <= capacity + 9
+    assert times[-1] - times[0] >= (40 - capacity) / 90 * 0.95
+
+
+def test_edgar_session_stays_under_sec_limit():
+    session = EdgarSession()
+    assert session.rate_limiter.capacity + session.rate_limiter.rate <= 10
+
+
+def take_tokens(path, count, times):
+    bucket = TokenBucket(rate=90, capacity=1, path=path)
+    for _ in range(count):
+        bucket.wait()
+        times.put(time.time())
+
+
+@pytest.mark.skipif(fcntl is None, reason='buckets are only shared between processes with fcntl')
+def test_token_bucket_shared_between_processes(tmp_path):
+    # three processes taking from one bucket file stay within a single process' rate
+    context = multiprocessing.get_context('spawn')
+    times = context.Queue()
+    processes = [
+        context.Process(target=take_tokens, args=(tmp_path / 'rate_limit', 15, times)) for _ in range(3)
+    ]
+    for process in processes:
+        process.start()
+    times = sorted(times.get(timeout=30) for _ in range(45))
+    for process in processes:
+        process.join()
+    assert max_in_window(times, 0.1) <= 1 + 9
+    assert times[-1] - times[0] >= 44 / 90 * 0.95
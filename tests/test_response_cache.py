@@ -0,0 +1,30 @@
+import os
+
+from response_cache import ResponseCache
+
+
+def test_put_and_get(tmp_path):
+    cache = ResponseCache(tmp_path)
+    assert cache.get('https://www.sec.gov/a') is None
+    cache.put('https://www.sec.gov/a', b'response')
+    assert cache.get('https://www.sec.gov/a') == b'response'
+
+
+def test_get_returns_content_evicted_after_reading(tmp_path, monkeypatch):
+    cache = ResponseCache(tmp_path)
+    cache.put('https://www.sec.gov/a', b'response')
+
+    def evicted(path, *args):
+        raise FileNotFoundError(path)
+    monkeypatch.setattr(os, 'utime', evicted)
+    assert cache.get('https://www.sec.gov/a') == b'response'
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(tmp_path, max_size=3000)
+    for i in range(3):
+        cache.put(f'https://www.sec.gov/{i}', os.urandom(800))
+        os.utime(cache.file_path(f'https://www.sec.gov/{i}'), (i, i))
+    cache.get('https://www.sec.gov/0')
+    cache.put('https://www.sec.gov/3', os.urandom(800))
+    assert [cache.get(f'https://www.sec.gov/{i}') is not None for i in range(4)] == [True, False, True, True]
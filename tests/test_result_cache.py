@@ -0,0 +1,46 @@
+import pandas as pd
+import pytest
+
+from result_cache import ResultCache
+
+
+def test_evicts_least_recently_used():
+    cache = ResultCache(max_items=2)
+    first, second = cache.put('first'), cache.put('second')
+    assert cache.get(first) == 'first'
+    third = cache.put('third')
+    # second was used least recently and is lost without a spill directory
+    assert list(cache.items) == [first, third]
+    with pytest.raises(KeyError):
+        cache.get(second)
+
+
+def test_evicted_results_spill_and_reload(tmp_path):
+    cache = ResultCache(max_items=2, spill_path=tmp_path)
+    frame = pd.DataFrame({'shares': [100.0, 250.0]}, index=pd.to_datetime(['2020-08-24', '2020-08-25']))
+    first = cache.put({'price_data': frame})
+    assert not any(tmp_path.iterdir())
+    second, third = cache.put('second'), cache.put('third')
+    # only the evicted result is written to disk
+    assert cache.spill.get(first) is not None and cache.spill.get(second) is None
+    reloaded = cache.get(first)
+    pd.testing.assert_frame_equal(reloaded['price_data'], frame)
+    # the reloaded result is back in memory, evicting and spilling the least recently used
+    assert list(cache.items) == [third, first]
+    assert cache.get(second) == 'second'
+    assert list(cache.items) == [first, second]
+    assert cache.get(third) == 'third'
+
+
+def test_write_through_shares_results_between_caches(tmp_path):
+    cache = ResultCache(max_items=2, spill_path=tmp_path, write_through=True)
+    other = ResultCache(max_items=2, spill_path=tmp_path, write_through=True)
+    key = cache.put({'status': 'done'}, key='job.status')
+    assert key == 'job.status'
+    # saved as soon as it is put, another process sharing the directory reads it
+    assert other.get('job.status') == {'status': 'done'}
+    for i in range(3):
+        cache.put(i)
+    assert cache.get('job.status') == {'status': 'done'}
+    with pytest.raises(KeyError):
+        other.get('unknown')
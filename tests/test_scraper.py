@@ -0,0 +1,73 @@
+import shutil
+import time
+
+import pandas as pd
+import pytest
+
+from edgar_server import LocalEdgar
+from jobs import Job, JobCancelled
+from response_cache import ResponseCache
+from scraper import EdgarSession, Form4Scraper
+from transaction_store import TransactionStore
+
+
+def test_scrape_every_filing_in_range(edgar, make_scraper):
+    transactions = make_scraper().form4_data(edgar.ticker, '2020-09-30', '2020-06-30')
+    accessions = [accession for accession, date in edgar.filings if date >= pd.Timestamp('2020-06-30')]
+    assert list(transactions.accession.unique()) == accessions
+    # one submission text file per filing
+    assert edgar.requested(r'\.txt$') == len(accessions)
+
+
+def test_concurrent_fetching_matches_serial(workdir, edgar, make_scraper):
+    expected = make_scraper(workers=1).form4_data(edgar.ticker, '', '2020-04-01')
+    concurrent = make_scraper(workers=8)
+    concurrent.store = TransactionStore(workdir / 'concurrent')
+    pd.testing.assert_frame_equal(concurrent.form4_data(edgar.ticker, '', '2020-04-01'), expected)
+
+
+def test_second_scrape_only_searches(edgar, make_scraper):
+    make_scraper().form4_data(edgar.ticker, '', '2020-06-30')
+    archive_requests = edgar.requested('^/Archives/')
+    transactions = make_scraper().form4_data(edgar.ticker, '', '2020-06-30')
+    assert edgar.requested('^/Archives/') == archive_requests
+    assert transactions.accession.nunique() == len([date for _, date in edgar.filings if date >= pd.Timestamp('2020-06-30')])
+
+
+@pytest.mark.parametrize('submissions', [True, False], ids=['submission', 'archive_directory'])
+def test_replay_scrape_offline(workdir, submissions):
+    edgar = LocalEdgar(submissions=submissions)
+    session = EdgarSession(rate=1000, backoff=0, cache=ResponseCache(workdir / 'cache'))
+    try:
+        expected = edgar.point(Form4Scraper(session=session)).form4_data(edgar.ticker, '2020-09-20', '2020-06-30')
+    finally:
+        edgar.close()
+    # replay from an empty store with the server gone, every request has to come from the cache
+    shutil.rmtree(workdir / 'saved_transactions' / 'store')
+    offline = EdgarSession(backoff=0, cache=ResponseCache(workdir / 'cache'), offline=True)
+    transactions = edgar.point(Form4Scraper(session=offline)).form4_data(edgar.ticker, '2020-09-20', '2020-06-30')
+    pd.testing.assert_frame_equal(transactions, expected)
+    assert offline.summary()['requests'] == 0
+
+
+def test_cancelling_through_progress_stops_fetching(workdir, edgar_session):
+    edgar = LocalEdgar(latency=0.05)
+    job = Job('scrape')
+    reports = []
+
+    def progress(text):
+        reports.append(text)
+        if len(reports) == 3:
+            job.cancel_event.set()
+        job.check()
+    try:
+        with pytest.raises(JobCancelled):
+            edgar.point(Form4Scraper(workers=2, session=edgar_session, progress=progress)).form4_data(
+                edgar.ticker, '', '2020-06-30'
+            )
+        requested = edgar.requested(r'\.txt$')
+        time.sleep(0.2)
+        # downloads that had not started when the job was cancelled are never made
+        assert edgar.requested(r'\.txt$') == requested < 10
+    finally:
+        edgar.close()
@@ -0,0 +1,225 @@
+from dateutil.relativedelta import relativedelta
+import numpy as np
+import pandas as pd
+import pytest
+
+from scraper import Form4Scraper
+from stat_kernels import (
+    forward_returns, horizons, insider_statistics, open_market_mask, split_adjust, split_factors, window_volatility
+)
+from test_form4_parser import form4_path
+
+
+def synthetic_transactions(rows, insiders, seed=0):
+    '''commonstock transactions of insiders trading at random, with the columns commonstock_transactions adds'''
+    rng = np.random.default_rng(seed)
+    transactions = pd.DataFrame({
+        'name': [f'Insider {i}' for i in rng.integers(0, insiders, rows)],
+        'shares': rng.integers(1, 100_000, rows) * rng.choice([1.0, -1.0], rows),
+        'price': rng.uniform(1, 500, rows).round(2),
+        'post_transaction_shares': rng.integers(100_000, 10_000_000, rows).astype(float),
+    })
+    transactions['amount'] = transactions.shares * transactions.price
+    transactions['pre_transaction_shares'] = transactions.post_transaction_shares - transactions.shares
+    return transactions
+
+
+def reference_insider_statistics(transactions, insiders=None):
+    '''insider statistics calculated one insider at a time, as statistics.py did before insider_statistics
+
+    insiders - names of the insiders calculated, every insider in transactions if not given
+    '''
+    stats = {key: [] for key in [
+        'insider', 'total_volume', 'total_volume_dollar', 'position_delta', 'position_delta_dollar',
+        'position_delta_percentage', 'position_rotation', 'trade_count'
+    ]}
+    for insider in transactions.name.unique() if insiders is None else insiders:
+        insider_transactions = transactions[transactions.name == insider]
+        total_volume = abs(insider_transactions.shares).sum()
+        position_delta = insider_transactions.shares.sum()
+        last_position = insider_transactions.pre_transaction_shares.iloc[-1]
+        stats['insider'].append(insider)
+        stats['total_volume'].append(total_volume)
+        stats['total_volume_dollar'].append(abs(insider_transactions.amount).sum())
+        stats['position_delta'].append(position_delta)
+        stats['position_delta_dollar'].append(insider_transactions.amount.sum())
+        stats['position_delta_percentage'].append(position_delta / last_position * 100)
+        stats['position_rotation'].append(total_volume / last_position * 100)
+        stats['trade_count'].append(len(insider_transactions))
+    return pd.DataFrame(stats)
+
+
+def test_insider_statistics_matches_reference():
+    transactions = synthetic_transactions(20_000, 300)
+    stats = insider_statistics(transactions)
+    expected = reference_insider_statistics(transactions)
+    # whole share counts sum exactly, insiders keep the order they first appear in
+    pd.testing.assert_frame_equal(
+        stats.drop(columns=['total_volume_dollar', 'position_delta_dollar']),
+        expected.drop(columns=['total_volume_dollar', 'position_delta_dollar'])
+    )
+    # dollar sums are added in a different order, so they agree to within rounding of the dollars traded
+    tolerance = expected.total_volume_dollar * 1e-13
+    for column in ['total_volume_dollar', 'position_delta_dollar']:
+        assert ((stats[column] - expected[column]).abs() <= tolerance).all()
+
+
+def test_insider_statistics_empty_and_single_trade():
+    transactions = synthetic_transactions(1, 1)
+    pd.testing.assert_frame_equal(insider_statistics(transactions), reference_insider_statistics(transactions))
+    empty = insider_statistics(transactions.iloc[:0])
+    assert empty.empty and list(empty.columns) == list(reference_insider_statistics(transactions).columns)
+
+
+def synthetic_prices(start='2019-01-01', end='2020-12-31', seed=0):
+    '''random walk of business day closes'''
+    index = pd.bdate_range(start, end)
+    rng = np.random.default_rng(seed)
+    return pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.02, len(index)))), index=index, name='Close')
+
+
+def reference_window_volatility(dates, prices, periods=horizons, log_returns=False):
+    '''pre and post standard deviations sliced out of prices for each date, as statistics.py did before'''
+    values = np.log(prices).diff() if log_returns else prices
+    volatility = {f'std_{label}': [] for label in periods}
+    for date in dates:
+        for label, period in periods.items():
+            volatility[f'std_{label}'].append(values.loc[date - period:date - relativedelta(days=1)].std())
+            if date + period <= prices.index[-1]:
+                volatility[f'std_{label}'].append(values.loc[date + relativedelta(days=1):date + period].std())
+            else:
+                volatility[f'std_{label}'].append(np.nan)
+    index = pd.MultiIndex.from_product([dates, ['pre', 'post']], names=['transaction_date', 'period'])
+    return pd.DataFrame(volatility, index=index)
+
+
+@pytest.mark.parametrize('log_returns', [False, True])
+def test_window_volatility_matches_slicing(log_returns):
+    prices = synthetic_prices()
+    dates = pd.DatetimeIndex([
+        # first bars, the pre windows hold no or a single value
+        '2019-01-01', '2019-01-02', '2019-01-03',
+        # weekend dates between bars, and a date whose windows end exactly on a bar
+        '2019-06-15', '2019-06-16', '2019-07-01', '2020-02-28',
+        # post windows ending on the last bar, just after it, and dates after the last bar
+        '2020-12-24', '2020-12-30', '2020-12-31', '2021-01-04',
+    ])
+    pd.testing.assert_frame_equal(
+        window_volatility(dates, prices, log_returns=log_returns),
+        reference_window_volatility(dates, prices, log_returns=log_returns),
+        rtol=1e-9
+    )
+
+
+def test_window_volatility_too_few_bars():
+    prices = synthetic_prices('2020-03-02', '2020-03-06')
+    volatility = window_volatility(pd.DatetimeIndex(['2020-03-03', '2020-03-05']), prices, {'1w': relativedelta(weeks=1)})
+    # the single bar before 3 March has no standard deviation, post windows ending after the last bar are NaN
+    assert np.isnan(volatility.loc[('2020-03-03', 'pre'), 'std_1w'])
+    assert np.isnan(volatility.loc[('2020-03-05', 'post'), 'std_1w'])
+    assert np.isnan(volatility.loc[('2020-03-03', 'post'), 'std_1w'])
+    assert volatility.loc[('2020-03-05', 'pre'), 'std_1w'] == pytest.approx(prices.loc['2020-03-02':'2020-03-04'].std())
+
+
+def test_split_adjust_two_splits():
+    # a 2 for 1 split on 1 June and a 4 for 1 split on 1 September
+    split_data = pd.DataFrame({'value': [0.25, 0.5]}, index=pd.DatetimeIndex(['2020-09-01', '2020-06-01']))
+    transactions = pd.DataFrame({
+        'transaction_period': pd.DatetimeIndex(
+            ['2020-05-29', '2020-06-01', '2020-07-15', '2020-09-01', '2020-09-02', '2020-05-01']
+        ),
+        'price': [400.0, 200.0, 210.0, 50.0, 52.0, 380.0],
+        'shares': [10.0, 20.0, 20.0, 80.0, 80.0, 10.0],
+        'post_transaction_shares': [100.0, 200.0, 220.0, 880.0, 960.0, 90.0],
+    }, index=[5, 4, 3, 2, 1, 0])
+    # both splits come after the first transactions, only the second after those between them, and a
+    # transaction on a split date is already priced after that split
+    factors = [0.125, 0.25, 0.25, 1.0, 1.0, 0.125]
+    assert list(split_factors(transactions.transaction_period, split_data)) == factors
+    adjusted = split_adjust(transactions, split_data)
+    pd.testing.assert_index_equal(adjusted.index, transactions.index)
+    assert list(adjusted.adj_price) == [50.0, 50.0, 52.5, 50.0, 52.0, 47.5]
+    assert list(adjusted.adj_shares) == [80.0, 80.0, 80.0, 80.0, 80.0, 80.0]
+    assert list(adjusted.adj_post_transaction_shares) == [800.0, 800.0, 880.0, 880.0, 960.0, 720.0]
+
+
+def test_split_adjust_without_splits():
+    transactions = pd.DataFrame({
+        'transaction_period': pd.DatetimeIndex(['2020-05-29']), 'price': [10.0], 'shares': [5.0],
+        'post_transaction_shares': [50.0]
+    })
+    adjusted = split_adjust(transactions, pd.DataFrame({'value': []}, index=pd.DatetimeIndex([])))
+    assert adjusted.to_dict('list') == {'adj_price': [10.0], 'adj_shares': [5.0], 'adj_post_transaction_shares': [50.0]}
+
+
+def test_open_market_mask():
+    price_data = pd.DataFrame({
+        'High': [11.0, 12.0, 13.0, 14.0],
+        'Low': [9.0, 10.0, 11.0, 12.0],
+    }, index=pd.DatetimeIndex(['2020-03-05', '2020-03-02', '2020-03-03', '2020-03-06']))
+    transactions = pd.DataFrame({
+        'transaction_period': pd.DatetimeIndex([
+            '2020-03-02', '2020-03-02', '2020-03-02', '2020-03-03',
+            # no bar on 4 March, before the first bar and after the last
+            '2020-03-04', '2020-02-28', '2020-03-09',
+        ]),
+        'adj_price': [12.0, 10.0, 12.5, 9.0, 12.0, 11.0, 13.0],
+    }, index=[7, 6, 5, 4, 3, 2, 1])
+    mask = open_market_mask(transactions, price_data)
+    # priced on the high and low of the day count, outside the day's range or without a bar don't
+    pd.testing.assert_series_equal(
+        mask, pd.Series([True, True, False, False, False, False, False], index=transactions.index)
+    )
+
+
+def reference_forward_returns(dates, prices, periods=horizons):
+    '''returns looked up one transaction at a time, as statistics.py did before forward_returns'''
+    returns = {f'return_{label}': [] for label in periods}
+    for date in dates:
+        for label, period in periods.items():
+            period_end = date + period
+            # the nearest date in prices, get_loc(method='nearest') before pandas 2
+            period_end = prices.index[prices.index.get_indexer([period_end], method='nearest')[0]]
+            x = prices[prices.index == date].iloc[0]
+            y = prices[prices.index == period_end].iloc[0]
+            returns[f'return_{label}'].append((y - x) / x * 100)
+    return pd.DataFrame(returns)
+
+
+def test_forward_returns_matches_reference_on_fixture_filings():
+    scraper = Form4Scraper()
+    for seed, path in enumerate(sorted(form4_path.glob('*.xml'))):
+        dates = pd.Series(scraper.parse_xml(path.stem, path.read_bytes())['transaction_period']).dropna()
+        if dates.empty:
+            continue
+        # a year of closes either side of the filing, with a bar missing a month after it
+        prices = synthetic_prices(dates.min() - pd.DateOffset(years=1), dates.max() + pd.DateOffset(years=1, weeks=2), seed)
+        prices = prices.drop(prices.index[prices.index.searchsorted(dates.min() + pd.DateOffset(months=1))])
+        pd.testing.assert_frame_equal(
+            forward_returns(dates, prices), reference_forward_returns(dates, prices), check_exact=False
+        )
+
+
+def test_forward_returns_nearest_bar():
+    prices = pd.Series(
+        [100.0, 110.0, 121.0, 125.0, 150.0],
+        index=pd.DatetimeIndex(['2020-03-02', '2020-03-03', '2020-03-09', '2020-03-11', '2020-03-20'])
+    )
+    periods = {'2d': pd.DateOffset(days=2), '4d': relativedelta(days=4), '1w': relativedelta(weeks=1)}
+    returns = forward_returns(pd.DatetimeIndex(['2020-03-02', '2020-03-03', '2020-03-09']), prices, periods)
+    assert list(returns.columns) == ['return_2d', 'return_4d', 'return_1w']
+    # 4 and 5 March are nearer 3 March than 9 March, 11 March has a bar
+    assert returns.return_2d.tolist() == pytest.approx([10.0, 0.0, 125 / 121 * 100 - 100])
+    # 6 March is 3 days from both 3 and 9 March so the tie goes to 9 March, 7 March is nearer 9 March
+    assert returns.return_4d.tolist() == pytest.approx([21.0, 10.0, 125 / 121 * 100 - 100])
+    # 10 March ties 9 and 11 March, 16 March is nearer 20 March
+    assert returns.return_1w.tolist() == pytest.approx([21.0, 125 / 110 * 100 - 100, 150 / 121 * 100 - 100])
+
+
+def test_forward_returns_missing_bars():
+    prices = synthetic_prices('2020-03-02', '2020-03-31')
+    dates = pd.DatetimeIndex(['2020-03-07', '2020-03-20', '2020-03-26', '2020-03-31', '2020-04-01'])
+    returns = forward_returns(dates, prices, {'1w': relativedelta(weeks=1)})
+    # no close on a saturday or after the last bar, and periods ending after the last bar have no end close
+    assert returns.return_1w.isna().tolist() == [True, False, True, True, True]
+    assert returns.return_1w[1] == pytest.approx((prices['2020-03-27'] / prices['2020-03-20'] - 1) * 100)
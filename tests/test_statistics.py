@@ -0,0 +1,47 @@
+import shutil
+
+import pandas as pd
+import pytest
+
+from edgar_server import LocalEdgar
+from price_providers import LocalProvider
+from response_cache import ResponseCache
+from scraper import EdgarSession, Form4Scraper
+from test_price_providers import write_prices
+
+# statistics registers pandas' matplotlib converters when imported
+pytest.importorskip('matplotlib')
+import statistics  # noqa: E402
+
+
+def test_statistics_offline_with_local_prices(workdir, monkeypatch):
+    edgar = LocalEdgar(filings=60)
+    session = EdgarSession(rate=1000, backoff=0, cache=ResponseCache(workdir / 'cache'))
+    try:
+        edgar.point(Form4Scraper(session=session)).form4_data(edgar.ticker, '', '2020-04-01')
+    finally:
+        edgar.close()
+    # statistics from the cached filings and local price files, without any network
+    shutil.rmtree(workdir / 'saved_transactions' / 'store')
+    offline = EdgarSession(cache=ResponseCache(workdir / 'cache'), offline=True)
+    monkeypatch.setattr(statistics, 'Form4Scraper', lambda **kwargs: edgar.point(Form4Scraper(session=offline, **kwargs)))
+    prices = write_prices(workdir / 'prices', edgar.ticker, '2019-06-01', '2021-06-30')
+
+    stats = statistics.InsiderStats(price_provider=LocalProvider(workdir / 'prices'))
+    transactions, insider_stats, volatility_stats, performance_stats, price_data = stats.get_data(
+        edgar.ticker, '', '2020-04-01'
+    )
+    assert offline.summary()['requests'] == 0
+    # filings are made every 3 days so some fall on weekends and are dropped
+    assert 0 < len(transactions) < 60
+    assert transactions.transaction_period.dt.dayofweek.max() < 5
+    assert set(transactions.code) == {'P', 'S'}
+    assert sorted(insider_stats.insider) == sorted(transactions.name.unique())
+    assert len(performance_stats) == len(transactions)
+    assert price_data.index[0] >= prices.index[0] and price_data.index[-1] == prices.index[-1]
+
+    # filters only select from the statistics already calculated
+    filtered = statistics.InsiderStats.from_features(stats.features()).get_data(
+        edgar.ticker, '', '2020-04-01', filter_side='P', filter_only=True
+    )
+    pd.testing.assert_frame_equal(filtered[0], transactions[transactions.code == 'P'])
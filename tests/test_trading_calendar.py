@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+from trading_calendar import TradingCalendar
+
+
+@pytest.fixture
+def calendar():
+    return TradingCalendar(1990, 2021)
+
+
+def test_closures(calendar):
+    days = ['1994-04-27', '2001-09-11', '2012-10-29', '2018-12-05', '2020-07-03', '2020-11-26', '2020-12-25']
+    assert not calendar.is_trading_day(days).any()
+    assert calendar.is_trading_day(['1994-04-26', '1994-04-28', '2020-07-02', '2020-11-27']).all()
+
+
+def test_next_and_prev_trading_day(calendar):
+    assert list(calendar.next_trading_day(['2020-07-03', '2020-07-06'])) == [pd.Timestamp('2020-07-06')] * 2
+    assert calendar.next_trading_day(['2020-07-06'], inclusive=False)[0] == pd.Timestamp('2020-07-07')
+    assert calendar.prev_trading_day(['1994-04-27'])[0] == pd.Timestamp('1994-04-26')
+    assert calendar.prev_trading_day(['2020-07-06'], inclusive=False)[0] == pd.Timestamp('2020-07-02')
+
+
+@pytest.mark.parametrize('date', ['1989-12-29', '2022-01-03'])
+def test_dates_outside_the_calendar_raise(calendar, date):
+    with pytest.raises(ValueError, match='outside the trading calendar'):
+        calendar.next_trading_day([date])
+    with pytest.raises(ValueError, match='outside the trading calendar'):
+        calendar.prev_trading_day([date])
+
+
+def test_no_trading_day_at_the_ends(calendar):
+    with pytest.raises(ValueError, match='No trading day before'):
+        calendar.prev_trading_day(['1990-01-01'])
+    with pytest.raises(ValueError, match='No trading day after'):
+        calendar.next_trading_day(['2021-12-31'], inclusive=False)
+
+
+def test_covering_has_a_trading_day_either_side():
+    calendar = TradingCalendar.covering(['1990-01-01', '2021-12-31'])
+    assert calendar.prev_trading_day(['1990-01-01'])[0] == pd.Timestamp('1989-12-29')
+    assert calendar.next_trading_day(['2021-12-31'], inclusive=False)[0] == pd.Timestamp('2022-01-03')
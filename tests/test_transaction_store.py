@@ -0,0 +1,142 @@
+from datetime import datetime
+from pathlib import Path
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import transaction_store
+from transaction_store import TransactionStore
+
+repository_path = Path(__file__).resolve().parents[1]
+
+
+def transactions(accessions, year=2020):
+    '''one open market purchase per accession'''
+    return pd.DataFrame({
+        'accession': accessions,
+        'report_period': [datetime(year, 1, 2 + i) for i in range(len(accessions))],
+        'transaction_period': [datetime(year, 1, 2 + i) for i in range(len(accessions))],
+        'name': 'Insider',
+        'isDirector': '1',
+        'isOfficer': 0,
+        'isTenPercentOwner': 0,
+        'officerTitle': 0,
+        'security': 'Common Stock',
+        'code': 'P',
+        'shares': 100.0,
+        'price': np.arange(len(accessions)) + 10.5,
+        'post_transaction_shares': 1000.0,
+        'ownership_nature': 'D',
+    })
+
+
+def test_append_skips_saved_accessions(tmp_path):
+    store = TransactionStore(tmp_path)
+    store.append('xyz', transactions(['a', 'b']))
+    store.append('XYZ', transactions(['b', 'c']))
+    saved = store.read('XYZ')
+    assert sorted(saved.accession) == ['a', 'b', 'c']
+    assert store.accessions('XYZ') == {'a', 'b', 'c'}
+
+
+@pytest.mark.skipif(transaction_store.fcntl is None, reason='file locks need fcntl')
+def test_lock_is_held_across_processes(tmp_path):
+    script = (
+        f'import sys, time; sys.path.insert(0, {str(repository_path)!r})\n'
+        'from transaction_store import TransactionStore\n'
+        f'with TransactionStore({str(tmp_path)!r}).lock("xyz"):\n'
+        '    print("locked", flush=True)\n'
+        '    time.sleep(1)\n'
+    )
+    child = subprocess.Popen([sys.executable, '-c', script], stdout=subprocess.PIPE, text=True)
+    try:
+        assert child.stdout.readline().strip() == 'locked'
+        start = time.monotonic()
+        with TransactionStore(tmp_path).lock('XYZ'):
+            waited = time.monotonic() - start
+    finally:
+        child.wait()
+        child.stdout.close()
+    assert waited > 0.5
+
+
+def test_append_compacts_partitions_with_many_files(tmp_path):
+    store = TransactionStore(tmp_path / 'compacted', max_files=3)
+    uncompacted = TransactionStore(tmp_path / 'uncompacted', max_files=100)
+    for i in range(7):
+        batch = pd.concat([transactions([f'{i}a', f'{i}b'], 2019), transactions([f'{i}c'], 2020)])
+        store.append('XYZ', batch)
+        uncompacted.append('XYZ', batch)
+    assert len(store.partition_files('XYZ', 2019)) <= 3
+    assert len(uncompacted.partition_files('XYZ', 2019)) == 7
+    pd.testing.assert_frame_equal(
+        store.read('XYZ').sort_values(['report_period', 'accession'], ignore_index=True),
+        uncompacted.read('XYZ').sort_values(['report_period', 'accession'], ignore_index=True)
+    )
+    store.compact('XYZ')
+    assert [len(store.partition_files('XYZ', year)) for year in [2019, 2020]] == [1, 1]
+    assert len(store.read('XYZ')) == 21
+
+
+def test_reads_during_compaction(tmp_path):
+    # a partition merged on every other append, read from another thread while it is rewritten
+    store = TransactionStore(tmp_path, max_files=2)
+    store.append('XYZ', transactions(['0']))
+    errors, counts = [], []
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            try:
+                saved = store.read('XYZ', columns=['accession'])
+            except Exception as error:
+                errors.append(error)
+                return
+            counts.append((saved.accession.nunique(), len(saved)))
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for i in range(1, 60):
+            store.append('XYZ', transactions([str(i)]))
+    finally:
+        done.set()
+        reader.join()
+    assert errors == []
+    # every read saw each saved accession once
+    assert counts and all(unique == rows for unique, rows in counts)
+
+
+def test_normalise_round_trip(tmp_path):
+    saved = transactions(['a', 'b', 'c'])
+    saved['isDirector'] = ['1', 'true', 0]
+    saved['isOfficer'] = ['0', 'false', np.nan]
+    saved['officerTitle'] = ['CEO', np.nan, 'CEO']
+    # whole share counts survive float32, a price float32 can't hold and a count above 2 ** 24 don't
+    saved['shares'] = [100.0, 250.0, np.nan]
+    saved['price'] = [10.5, 0.1, 12.25]
+    saved['post_transaction_shares'] = [1000.0, 2.0 ** 24 + 1, 3000.0]
+    normalised = transaction_store.normalise(saved)
+    assert normalised.shares.dtype == np.float32
+    assert normalised.price.dtype == np.float64 and normalised.post_transaction_shares.dtype == np.float64
+    assert normalised.isDirector.tolist() == [True, True, False]
+    assert normalised.isOfficer.tolist() == [False, False, False]
+    for column in ['name', 'officerTitle', 'security', 'code', 'ownership_nature']:
+        assert isinstance(normalised[column].dtype, pd.CategoricalDtype)
+    assert normalised.officerTitle.isna().tolist() == [False, True, False]
+
+    store = TransactionStore(tmp_path)
+    store.append('XYZ', saved)
+    read = store.read('XYZ').sort_values('accession', ignore_index=True)
+    # every value comes back exactly as it was given
+    for column in ['shares', 'price', 'post_transaction_shares']:
+        assert np.array_equal(read[column].values.astype(float), saved[column].values, equal_nan=True)
+    assert read.shares.dtype == np.float32 and read.price.tolist() == [10.5, 0.1, 12.25]
+    assert read.post_transaction_shares.tolist()[1] == 2.0 ** 24 + 1
+    assert read.isDirector.dtype == bool and read.isDirector.tolist() == [True, True, False]
+    assert isinstance(read.name.dtype, pd.CategoricalDtype)
@@ -0,0 +1,143 @@
+'''
+NYSE trading calendar used to filter and align dates to trading days
+'''
+
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+
+# days the exchange closed outside its regular holiday schedule
+special_closures = [
+    '1994-04-27',  # national day of mourning for Richard Nixon
+    '2001-09-11', '2001-09-12', '2001-09-13', '2001-09-14',  # september 11th
+    '2004-06-11',  # national day of mourning for Ronald Reagan
+    '2007-01-02',  # national day of mourning for Gerald Ford
+    '2012-10-29', '2012-10-30',  # hurricane sandy
+    '2018-12-05',  # national day of mourning for George H.W. Bush
+    '2025-01-09',  # national day of mourning for Jimmy Carter
+]
+
+
+def easter(year):
+    '''date of easter sunday (anonymous gregorian algorithm)'''
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    return date(year, month, (h + l - 7 * m + 33 * month + 19) % 32)
+
+
+def nth_weekday(year, month, weekday, n):
+    '''nth (1 based, -1 for last) weekday (monday = 0) of the month'''
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def observed(day):
+    '''holidays on a saturday are observed on friday and on a sunday the following monday'''
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def nyse_holidays(year):
+    '''full day NYSE holidays in year'''
+    holidays = [
+        nth_weekday(year, 2, 0, 3),  # washington's birthday
+        easter(year) - timedelta(days=2),  # good friday
+        nth_weekday(year, 5, 0, -1),  # memorial day
+        observed(date(year, 7, 4)),  # independence day
+        nth_weekday(year, 9, 0, 1),  # labor day
+        nth_weekday(year, 11, 3, 4),  # thanksgiving
+        observed(date(year, 12, 25)),  # christmas
+    ]
+    # new year's day on a saturday is not observed on the previous friday
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.append(observed(new_year))
+    if year >= 1998:
+        holidays.append(nth_weekday(year, 1, 0, 3))  # martin luther king jr. day
+    if year >= 2022:
+        holidays.append(observed(date(year, 6, 19)))  # juneteenth
+    return holidays
+
+
+class TradingCalendar():
+    '''sorted array of NYSE trading days between start_year and end_year (inclusive)'''
+    cache = {}
+
+    def __init__(self, start_year=1990, end_year=None):
+        self.start_year = start_year
+        self.end_year = date.today().year + 1 if end_year is None else end_year
+        self.trading_days = self.build(self.start_year, self.end_year)
+
+    @classmethod
+    def build(cls, start_year, end_year):
+        '''trading days as datetime64[D], built once for each year range'''
+        if (start_year, end_year) not in cls.cache:
+            weekdays = pd.bdate_range(f'{start_year}-01-01', f'{end_year}-12-31').values.astype('datetime64[D]')
+            closed = [day for year in range(start_year, end_year + 1) for day in nyse_holidays(year)]
+            closed = np.array(closed + special_closures, dtype='datetime64[D]')
+            cls.cache[(start_year, end_year)] = weekdays[~np.isin(weekdays, closed)]
+        return cls.cache[(start_year, end_year)]
+
+    @classmethod
+    def covering(cls, dates):
+        '''calendar covering every date in dates, with a year either side so they all have a trading day before
+        and after them'''
+        dates = pd.DatetimeIndex(dates)
+        if len(dates) == 0:
+            return cls()
+        return cls(min(dates.min().year - 1, 1990), max(dates.max().year, date.today().year) + 1)
+
+    def to_days(self, dates):
+        '''dates as a datetime64[D] array'''
+        return pd.DatetimeIndex(dates).values.astype('datetime64[D]')
+
+    def is_trading_day(self, dates):
+        '''boolean array, True where the exchange was open on the date'''
+        days = self.to_days(dates)
+        positions = np.clip(self.trading_days.searchsorted(days), 0, len(self.trading_days) - 1)
+        return self.trading_days[positions] == days
+
+    def check_range(self, days):
+        '''raise ValueError if any of days is outside the calendar's years'''
+        if len(days) == 0:
+            return
+        first, last = np.datetime64(f'{self.start_year}-01-01'), np.datetime64(f'{self.end_year}-12-31')
+        if days.min() < first or days.max() > last:
+            raise ValueError(
+                f"Dates between {days.min()} and {days.max()} are outside the trading calendar's range "
+                f"{self.start_year}-{self.end_year}, use TradingCalendar.covering(dates)"
+            )
+
+    def next_trading_day(self, dates, inclusive=True):
+        '''first trading day on (if inclusive) or after each date, raises ValueError for dates with no trading
+        day after them in the calendar'''
+        days = self.to_days(dates)
+        self.check_range(days)
+        positions = self.trading_days.searchsorted(days, side='left' if inclusive else 'right')
+        if len(positions) and positions.max() == len(self.trading_days):
+            raise ValueError(f"No trading day after {days.max()} in the trading calendar")
+        return pd.DatetimeIndex(self.trading_days[positions].astype('datetime64[ns]'))
+
+    def prev_trading_day(self, dates, inclusive=True):
+        '''last trading day on (if inclusive) or before each date, raises ValueError for dates with no trading
+        day before them in the calendar'''
+        days = self.to_days(dates)
+        self.check_range(days)
+        positions = self.trading_days.searchsorted(days, side='right' if inclusive else 'left') - 1
+        if len(positions) and positions.min() < 0:
+            raise ValueError(f"No trading day before {days.min()} in the trading calendar")
+        return pd.DatetimeIndex(self.trading_days[positions].astype('datetime64[ns]'))
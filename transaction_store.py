@@ -0,0 +1,322 @@
+'''
+Columnar parquet store for scraped form 4 transactions, partitioned by ticker and year
+'''
+
+from collections import defaultdict
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+import shutil
+import sqlite3
+import threading
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+try:
+    import fcntl
+except ImportError:
+    # not available on windows, where updates are only serialised between threads of one process
+    fcntl = None
+
+
+# typed columns of the transactions frame returned by Form4Scraper
+schema = pa.schema([
+    ('accession', pa.string()),
+    ('report_period', pa.timestamp('us')),
+    ('transaction_period', pa.timestamp('us')),
+    ('name', pa.string()),
+    ('isDirector', pa.bool_()),
+    ('isOfficer', pa.bool_()),
+    ('isTenPercentOwner', pa.bool_()),
+    ('officerTitle', pa.string()),
+    ('security', pa.string()),
+    ('code', pa.string()),
+    ('shares', pa.float64()),
+    ('price', pa.float64()),
+    ('post_transaction_shares', pa.float64()),
+    ('ownership_nature', pa.string()),
+])
+
+partitioning = ds.partitioning(pa.schema([('year', pa.int32())]), flavor='hive')
+
+# repeated strings are read as categoricals and relationship flags as booleans
+categorical_columns = ['name', 'officerTitle', 'security', 'code', 'ownership_nature']
+flag_columns = ['isDirector', 'isOfficer', 'isTenPercentOwner']
+
+# threads of this process updating the same ticker of a store wait for each other
+thread_locks = defaultdict(threading.Lock)
+thread_locks_lock = threading.Lock()
+
+
+def normalise(transactions):
+    '''transactions with compact typed columns, any of the store's columns missing are left out
+
+    strings repeated across rows become categoricals, relationship flags (a mix of '1', 'true', '0', 'false',
+    integer 0 and missing tags) become booleans, dates datetime64 and float columns float32 where every value
+    survives the round trip exactly
+    '''
+    transactions = transactions.copy()
+    for column in transactions.columns.intersection(categorical_columns):
+        values = transactions[column]
+        transactions[column] = values.where(values.isna(), values.astype(str)).astype('category')
+    for column in transactions.columns.intersection(flag_columns):
+        transactions[column] = transactions[column].astype(str).str.lower().isin(['1', '1.0', 'true'])
+    for column in transactions.columns.intersection(['report_period', 'transaction_period']):
+        transactions[column] = pd.to_datetime(transactions[column])
+    for column in transactions.columns.intersection(['shares', 'price', 'post_transaction_shares']):
+        values = transactions[column].astype(float)
+        compact = values.astype(np.float32)
+        lossless = np.array_equal(compact.values.astype(float), values.values, equal_nan=True)
+        transactions[column] = compact if lossless else values
+    return transactions
+
+
+class TransactionStore():
+    '''
+    path - directory holding the ticker partitions and accession index
+    max_files - number of files a year partition holds before appending to it merges them into one
+    '''
+    def __init__(self, path=Path('saved_transactions/store'), max_files=16):
+        self.path = Path(path)
+        self.max_files = max_files
+        self.path.mkdir(parents=True, exist_ok=True)
+        # index of saved accessions so updates don't need to read saved transactions
+        self.index_path = self.path / 'accessions.db'
+        self.execute(
+            'CREATE TABLE IF NOT EXISTS accessions ('
+            'ticker TEXT NOT NULL, accession TEXT NOT NULL, filing_date TEXT, '
+            'PRIMARY KEY (ticker, accession))'
+        )
+        # filing date ranges that have been searched and saved completely
+        self.execute('CREATE TABLE IF NOT EXISTS coverage (ticker TEXT NOT NULL, oldest TEXT, newest TEXT)')
+
+    def execute(self, sql, parameters=(), many=False):
+        '''run sql against the accession index, returning all rows'''
+        with closing(sqlite3.connect(str(self.index_path), timeout=30)) as connection:
+            with connection:
+                cursor = connection.executemany(sql, parameters) if many else connection.execute(sql, parameters)
+                return cursor.fetchall()
+
+    def accessions(self, ticker):
+        '''set of accessions saved for ticker'''
+        ticker = ticker.upper()
+        accessions = self.execute('SELECT accession FROM accessions WHERE ticker = ?', (ticker,))
+        # index stores saved before the index existed
+        if not accessions and self.exists(ticker):
+            self.index(ticker, self.read(ticker, columns=['accession']).accession.unique())
+            accessions = self.execute('SELECT accession FROM accessions WHERE ticker = ?', (ticker,))
+        return {accession for accession, in accessions}
+
+    def index(self, ticker, accessions, filing_dates=None):
+        '''add accessions and their filing dates to the accession index'''
+        filing_dates = {} if filing_dates is None else filing_dates
+        rows = []
+        for accession in accessions:
+            filing_date = filing_dates.get(accession)
+            rows.append((ticker.upper(), accession, filing_date.strftime('%Y-%m-%d') if filing_date else None))
+        self.execute('INSERT OR REPLACE INTO accessions VALUES (?, ?, ?)', rows, many=True)
+
+    @contextmanager
+    def lock(self, ticker):
+        '''held while the ticker's saved transactions are searched and updated
+
+        a file lock in locks/<TICKER>.lock, so scrapers in other threads and processes saving the same ticker
+        to the store wait for each other
+        '''
+        ticker = ticker.upper()
+        with thread_locks_lock:
+            thread_lock = thread_locks[(str(self.path.resolve()), ticker)]
+        with thread_lock:
+            if fcntl is None:
+                yield
+                return
+            lock_path = self.path / 'locks' / f'{ticker}.lock'
+            lock_path.parent.mkdir(exist_ok=True)
+            with open(lock_path, 'a') as file:
+                fcntl.flock(file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def files_lock(self, ticker, shared=False):
+        '''held while files are added to or removed from the ticker's partitions, or shared while they are read
+
+        unlike lock it is only held for a single write or read, so reads wait for an append or compaction to
+        finish rather than seeing both the merged file and the files it replaces, but never for a whole scrape
+        '''
+        ticker = ticker.upper()
+        if fcntl is None:
+            with thread_locks_lock:
+                thread_lock = thread_locks[(str(self.path.resolve()), ticker, 'files')]
+            with thread_lock:
+                yield
+            return
+        lock_path = self.path / 'locks' / f'{ticker}.files.lock'
+        lock_path.parent.mkdir(exist_ok=True)
+        # flock locks each opened file, so threads of one process wait for each other too
+        with open(lock_path, 'a') as file:
+            fcntl.flock(file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def ticker_path(self, ticker):
+        '''directory holding the year partitions of ticker'''
+        return self.path / f'ticker={ticker.upper()}'
+
+    def exists(self, ticker):
+        '''check if transactions have been saved for ticker'''
+        return self.ticker_path(ticker).exists()
+
+    def to_table(self, transactions):
+        '''convert transactions frame to an arrow table with typed columns and a year column'''
+        transactions = normalise(transactions)
+        for column in transactions.columns.intersection(categorical_columns + ['accession']):
+            values = transactions[column].astype(object)
+            transactions[column] = values.where(values.isna(), values.astype(str))
+        table = pa.Table.from_pandas(transactions[schema.names], schema=schema, preserve_index=False)
+        year = pa.array(transactions.report_period.dt.year.values, pa.int32())
+        return table.append_column('year', year)
+
+    def oldest_accession(self, ticker, after):
+        '''earliest filed saved accession with a filing date after the given date'''
+        rows = self.execute(
+            'SELECT accession FROM accessions WHERE ticker = ? AND filing_date > ? '
+            'ORDER BY filing_date, accession DESC LIMIT 1',
+            (ticker.upper(), after.strftime('%Y-%m-%d'))
+        )
+        return rows[0][0] if rows else None
+
+    def coverage(self, ticker):
+        '''(oldest, newest) filing date ranges in which every filing for ticker has been saved'''
+        rows = self.execute('SELECT oldest, newest FROM coverage WHERE ticker = ? ORDER BY oldest', (ticker.upper(),))
+        return [tuple(datetime.strptime(date, '%Y-%m-%d') for date in row) for row in rows]
+
+    def add_coverage(self, ticker, oldest, newest):
+        '''record a completely saved filing date range, merging it with overlapping ranges'''
+        ranges = []
+        for start, end in sorted(self.coverage(ticker) + [(oldest, newest)]):
+            if ranges and start <= ranges[-1][1] + timedelta(days=1):
+                ranges[-1] = (ranges[-1][0], max(ranges[-1][1], end))
+            else:
+                ranges.append((start, end))
+        rows = [(ticker.upper(), start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d')) for start, end in ranges]
+        self.execute('DELETE FROM coverage WHERE ticker = ?', (ticker.upper(),))
+        self.execute('INSERT INTO coverage VALUES (?, ?, ?)', rows, many=True)
+
+    def write(self, ticker, transactions):
+        '''replace all saved transactions for ticker'''
+        with self.files_lock(ticker):
+            if self.exists(ticker):
+                shutil.rmtree(self.ticker_path(ticker))
+        self.execute('DELETE FROM accessions WHERE ticker = ?', (ticker.upper(),))
+        self.execute('DELETE FROM coverage WHERE ticker = ?', (ticker.upper(),))
+        self.append(ticker, transactions)
+
+    def append(self, ticker, transactions, filing_dates=None):
+        '''add new transactions to the ticker's year partitions without rewriting saved files
+
+        filing_dates - dictionary of accession: filing date saved in the accession index
+        '''
+        # accessions saved since the caller checked, e.g. by a scraper not holding the ticker's lock
+        transactions = transactions[~transactions.accession.isin(self.accessions(ticker))]
+        if len(transactions) == 0:
+            return
+        table = self.to_table(transactions)
+        with self.files_lock(ticker):
+            pq.write_to_dataset(table, str(self.ticker_path(ticker)), partition_cols=['year'])
+        self.index(ticker, transactions.accession.unique(), filing_dates)
+        # every append adds a file to each year it touches, reading many small files is slow
+        years = set(table.column('year').to_pylist())
+        years = [year for year in years if len(self.partition_files(ticker, year)) > self.max_files]
+        if years:
+            self.compact(ticker, years)
+
+    def partition_files(self, ticker, year):
+        '''parquet files of a year partition'''
+        return sorted((self.ticker_path(ticker) / f'year={year}').glob('*.parquet'))
+
+    def compact(self, ticker, years=None):
+        '''merge the files written by each append into one file per year partition
+
+        years - partitions to merge, every partition if None
+        callers hold the ticker's lock, see lock. reads wait for the merged file to replace the files it was
+        merged from, see files_lock
+        '''
+        if years is None:
+            years = [int(path.name.split('=')[1]) for path in self.ticker_path(ticker).glob('year=*')]
+        for year in years:
+            files = self.partition_files(ticker, year)
+            if len(files) <= 1:
+                continue
+            # files saved before the relationship flags were booleans are cast to the current schema, files are
+            # read in the order they are listed in so reads return rows in the same order after merging
+            table = ds.dataset([str(path) for path in files], schema=schema, format='parquet').to_table()
+            partition = files[0].parent
+            # hidden while written, reads carry on until the merged file is swapped in
+            temp_path = partition / f'.{uuid.uuid4().hex}.tmp'
+            pq.write_table(table, str(temp_path))
+            with self.files_lock(ticker):
+                temp_path.replace(partition / f'{uuid.uuid4().hex}-0.parquet')
+                for path in files:
+                    path.unlink()
+
+    def read(self, ticker, columns=None, start=None, end=None):
+        '''read saved transactions for ticker, newest report first
+
+        columns - subset of columns to read
+        start, end - only read transactions reported between these dates (inclusive), partitions
+                     for years outside the range are skipped
+        '''
+        columns = schema.names if columns is None else list(columns)
+        read_columns = columns if 'report_period' in columns else columns + ['report_period']
+        filters = []
+        if start is not None and start != '':
+            start = pd.Timestamp(start)
+            filters += [ds.field('year') >= start.year, ds.field('report_period') >= start.to_pydatetime()]
+        if end is not None and end != '':
+            end = pd.Timestamp(end)
+            filters += [ds.field('year') <= end.year, ds.field('report_period') <= end.to_pydatetime()]
+        expression = None
+        for condition in filters:
+            expression = condition if expression is None else expression & condition
+        # the files are listed and read without an append or compaction changing them in between
+        with self.files_lock(ticker, shared=True):
+            if not self.exists(ticker):
+                raise FileNotFoundError(f"No saved transactions for {ticker.upper()}")
+            # files saved before the relationship flags were booleans are cast to the current schema
+            dataset = ds.dataset(
+                str(self.ticker_path(ticker)), schema=schema.append(pa.field('year', pa.int32())),
+                format='parquet', partitioning=partitioning
+            )
+            table = dataset.to_table(columns=read_columns, filter=expression)
+        transactions = table.to_pandas()
+        # sorting by report period, stable so rows within a filing keep their order
+        transactions.sort_values('report_period', ascending=False, kind='mergesort', inplace=True)
+        transactions.reset_index(drop=True, inplace=True)
+        return normalise(transactions[columns])
+
+
+def migrate_pickles(pickle_path=Path('saved_transactions'), store=None):
+    '''one-shot migration of saved <TICKER>.pkl files into the parquet store'''
+    store = TransactionStore() if store is None else store
+    migrated = []
+    for path in sorted(Path(pickle_path).glob('*.pkl')):
+        ticker = path.stem.upper()
+        if not store.exists(ticker):
+            store.write(ticker, pd.read_pickle(path))
+            migrated.append(ticker)
+    return migrated
+
+
+if __name__ == '__main__':
+    migrated = migrate_pickles()
+    print(f"Migrated {len(migrated)} tickers: {', '.join(migrated)}")
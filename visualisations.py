@@ -1,16 +1,19 @@
 from statistics import InsiderStats
+from stat_kernels import open_market_mask
+from trading_calendar import TradingCalendar
+from price_providers import provider
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import timedelta
 
-from pandas_datareader import DataReader
 from pandas.plotting import register_matplotlib_converters
 register_matplotlib_converters()
 
 
 class Visualise():
-    def __init__(self):
-        self.stats = InsiderStats()
+    def __init__(self, price_provider=provider, progress=None):
+        self.price_provider = price_provider
+        self.stats = InsiderStats(price_provider=price_provider, progress=progress)
         self.data_check = False
         self.ohlc_details = {
             'total_buy_vol': None,
@@ -43,11 +46,33 @@ class Visualise():
 
         # get spy, vix data if new data is required
         if not filter_only:
+            self.stats.report('getting index data...')
             tickers = ['SPY', '^VIX']
-            self.spy_data, self.vix_data = [DataReader(_ticker, 'yahoo', to_date, from_date) for _ticker in tickers]
+            self.spy_data, self.vix_data = [
+                self.price_provider.prices(_ticker, to_date, from_date) for _ticker in tickers
+            ]
 
         return data
 
+    def features(self):
+        '''ticker, index data and InsiderStats features of the last request, see InsiderStats.features'''
+        assert self.data_check, 'Must first get statistics using get_stats'
+        return {
+            'ticker': self.ticker,
+            'spy_data': self.spy_data,
+            'vix_data': self.vix_data,
+            'stats': self.stats.features(),
+        }
+
+    @classmethod
+    def from_features(cls, features, **kwargs):
+        '''Visualise ready to draw charts and filter the statistics of an earlier request'''
+        vis = cls(**kwargs)
+        vis.stats = InsiderStats.from_features(features['stats'], price_provider=vis.price_provider)
+        vis.ticker, vis.spy_data, vis.vix_data = features['ticker'], features['spy_data'], features['vix_data']
+        vis.data_check = True
+        return vis
+
     def update_ohlc_details(self, buys=None, sells=None, transactions=None, zeros=False):
         '''details displayed above ohlc chart'''
         # update details
@@ -161,16 +186,7 @@ class Visualise():
         assert self.data_check == True, "Must first get statistics using get_data"
         # filter for open market transactions
         if filter_market_trades:
-            highs, lows = [], []
-            for period in transactions.transaction_period:
-                highs.append(price_data[price_data.index == period].High.iloc[0])
-                lows.append(price_data[price_data.index == period].Low.iloc[0])
-            transactions = transactions[
-                (transactions.adj_price <= highs) &
-                (transactions.adj_price >= lows)
-            ]
-        else:
-            transactions = transactions
+            transactions = transactions[open_market_mask(transactions, price_data)]
 
         if len(transactions) == 0:
             return self.price_chart(price_data)
@@ -188,8 +204,10 @@ class Visualise():
 
         # determine max/min for axis
         ymax, ymin = price_range.max() * 1.2, price_range.min() * 0.8
-        xmin = transactions.iloc[-1].transaction_period - timedelta(weeks=4)
-        xmax = transactions.iloc[0].transaction_period + timedelta(weeks=4)
+        start = transactions.iloc[-1].transaction_period - timedelta(weeks=4)
+        end = transactions.iloc[0].transaction_period + timedelta(weeks=4)
+        calendar = TradingCalendar.covering([start, end])
+        xmin, xmax = calendar.prev_trading_day([start])[0], calendar.next_trading_day([end])[0]
 
         # crate ohlc bars and buy/sell scatter points
         ohlc = self.get_ohlc(price_data, self.ticker)